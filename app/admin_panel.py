@@ -1,14 +1,14 @@
 from tkinter import *
 from tkinter import ttk
 from tkinter import messagebox
-from database import Database
+from database import get_database
 
 class AdminPanel:
     def __init__(self, master=None, db=None):
         self.master = master if master else Tk()
         self.master.title("Панель администратора")
-        self.master.geometry("800x600")
-        self.db = db if db else Database()
+        self.master.geometry("900x800")
+        self.db = db if db else get_database()
         self.create_widgets()
 
     def create_widgets(self):
@@ -52,6 +52,38 @@ class AdminPanel:
         Button(btn_frame, text="Добавить администратора", command=self.add_admin).pack(side=LEFT, padx=5)
         Button(btn_frame, text="Удалить пользователя", command=self.delete_user).pack(side=LEFT, padx=5)
         
+        # Фрейм со статистикой запросов к БД
+        stats_frame = LabelFrame(self.master, text="Статистика запросов к БД")
+        stats_frame.pack(fill=BOTH, expand=True, padx=20, pady=(0, 20))
+        
+        columns = ('method', 'calls', 'total_ms', 'mean_ms', 'p50_ms', 'p99_ms', 'rows')
+        self.stats_tree = ttk.Treeview(stats_frame, columns=columns, show='headings', height=8)
+        
+        self.stats_tree.heading('method', text='Метод')
+        self.stats_tree.heading('calls', text='Вызовов')
+        self.stats_tree.heading('total_ms', text='Всего, мс')
+        self.stats_tree.heading('mean_ms', text='Среднее, мс')
+        self.stats_tree.heading('p50_ms', text='p50, мс')
+        self.stats_tree.heading('p99_ms', text='p99, мс')
+        self.stats_tree.heading('rows', text='Строк')
+        
+        self.stats_tree.column('method', width=220)
+        for column in columns[1:]:
+            self.stats_tree.column(column, width=90, anchor=E)
+        self.stats_tree.pack(fill=BOTH, expand=True, pady=5)
+        
+        # Журнал медленных вызовов с планами запросов
+        Label(stats_frame, text="Медленные вызовы:").pack(anchor=W)
+        self.slow_text = Text(stats_frame, height=8, wrap=WORD)
+        self.slow_text.pack(fill=BOTH, expand=True, pady=5)
+        
+        stats_btn_frame = Frame(stats_frame)
+        stats_btn_frame.pack(fill=X, pady=5)
+        Button(stats_btn_frame, text="Обновить статистику", command=self.load_query_stats).pack(side=LEFT, padx=5)
+        Button(stats_btn_frame, text="Сбросить статистику", command=self.reset_query_stats).pack(side=LEFT, padx=5)
+        
+        self.load_query_stats()
+        
         # Кнопка закрытия
         Button(self.master, text="Закрыть", command=self.master.destroy).pack(pady=10)
 
@@ -68,6 +100,34 @@ class AdminPanel:
             user_data[2] = "Да" if user_data[2] == 1 else "Нет"
             self.users_tree.insert('', END, values=user_data)
     
+    def load_query_stats(self):
+        """Показывает снимок статистики запросов к БД"""
+        for item in self.stats_tree.get_children():
+            self.stats_tree.delete(item)
+        
+        stats = self.db.get_query_stats()
+        for method, entry in stats['methods'].items():
+            self.stats_tree.insert('', END, values=(
+                method, entry['calls'], f"{entry['total_ms']:.1f}", f"{entry['mean_ms']:.2f}",
+                f"{entry['p50_ms']:.2f}", f"{entry['p99_ms']:.2f}", entry['rows']))
+        
+        self.slow_text.delete('1.0', END)
+        if not stats['slow_queries']:
+            self.slow_text.insert(END, f"Нет вызовов дольше {stats['slow_threshold_ms']:.0f} мс "
+                                       f"с {stats['since']}")
+        for entry in reversed(stats['slow_queries']):
+            self.slow_text.insert(END, f"{entry['at']}  {entry['method']}: {entry['ms']:.0f} мс, "
+                                       f"строк: {entry['rows']}\n")
+            for statement in entry['statements'][:3]:
+                self.slow_text.insert(END, f"    {statement['ms']:.0f} мс  {statement['sql'][:200]}\n")
+                for step in statement['plan'] or []:
+                    self.slow_text.insert(END, f"        {step}\n")
+            self.slow_text.insert(END, "\n")
+    
+    def reset_query_stats(self):
+        self.db.reset_query_stats()
+        self.load_query_stats()
+    
     def add_admin(self):
         # Создаем окно для добавления администратора
         add_window = Toplevel(self.master)
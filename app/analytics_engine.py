@@ -0,0 +1,430 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Аналитический движок результатов опроса, не зависящий от интерфейса.
+# Ответы на вопрос загружаются в колонку NumPy (коды вариантов, матрица
+# выбранных вариантов или массив чисел/длин), и вся статистика считается
+# векторно. Итоги без фильтра берутся из предрасчитанной таблицы question_stats,
+# так что для них не нужно читать сами ответы.
+# Срезы (итоги в сегменте анкет) и таблицы сопряженности считаются по тем же
+# колонкам и кэшируются в наборе данных по (вопросы, фильтр).
+
+QUANTILES = (0.25, 0.5, 0.75)
+
+# Сколько наборов данных опросов держать в памяти
+DATASET_CACHE_SIZE = 8
+
+def question_kind(question_type):
+    """Вид колонки для типа вопроса"""
+    if question_type == 'checkbox':
+        return 'multi_choice'
+    if question_type in ('radio', 'select'):
+        return 'choice'
+    if question_type == 'number':
+        return 'number'
+    return 'text'
+
+def weighted_quantiles(values, weights, quantiles=QUANTILES):
+    """Квантили выборки, заданной значениями и их частотами (обратная функция распределения)"""
+    order = np.argsort(values)
+    values = values[order]
+    cumulative = np.cumsum(weights[order])
+    targets = np.asarray(quantiles) * cumulative[-1]
+    positions = np.searchsorted(cumulative, targets, side='left')
+    return values[np.minimum(positions, len(values) - 1)]
+
+def describe(values, weights=None):
+    """Количество, среднее, стандартное отклонение, минимум, максимум и квантили"""
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.ones_like(values) if weights is None else np.asarray(weights, dtype=np.float64)
+    keep = np.isfinite(values) & (weights > 0)
+    values = values[keep]
+    weights = weights[keep]
+    
+    if not values.size:
+        return {'count': 0, 'mean': None, 'std': None, 'min': None, 'max': None, 'quantiles': {}}
+    
+    mean = np.average(values, weights=weights)
+    std = np.sqrt(np.average((values - mean) ** 2, weights=weights))
+    return {
+        'count': int(weights.sum()),
+        'mean': float(mean),
+        'std': float(std),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'quantiles': dict(zip(QUANTILES, weighted_quantiles(values, weights).tolist()))
+    }
+
+def histogram(values, weights=None, bins=10):
+    """Гистограмма выборки: (количества, границы интервалов)"""
+    values = np.asarray(values, dtype=np.float64)
+    keep = np.isfinite(values)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)[keep]
+    return np.histogram(values[keep], bins=bins, weights=weights)
+
+def _to_float(texts):
+    """Преобразует массив строк в числа, нечисловые значения - NaN"""
+    try:
+        return texts.astype(np.float64)
+    except ValueError:
+        pass
+    
+    values = np.empty(texts.size, dtype=np.float64)
+    for index, text in enumerate(texts.tolist()):
+        try:
+            values[index] = float(text)
+        except ValueError:
+            values[index] = np.nan
+    return values
+
+class ChoiceColumn:
+    """Вопрос с одним вариантом ответа: код варианта для каждой анкеты (-1 - нет ответа)"""
+    kind = 'choice'
+    
+    def __init__(self, labels, codes):
+        self.labels = labels
+        self.codes = codes
+    
+    def summary(self, mask=None):
+        codes = self.codes if mask is None else self.codes[mask]
+        codes = codes[codes >= 0]
+        return {
+            'kind': self.kind,
+            'count': int(codes.size),
+            'labels': list(self.labels),
+            'counts': np.bincount(codes, minlength=len(self.labels))
+        }
+
+    def matches(self, values):
+        """Маска анкет, выбравших один из вариантов values"""
+        codes = [code for code, label in enumerate(self.labels) if label in values]
+        return np.isin(self.codes, codes)
+    
+    def indicators(self):
+        """Подписи вариантов и матрица анкета x вариант"""
+        matrix = np.zeros((len(self.codes), len(self.labels)), dtype=bool)
+        answered = np.flatnonzero(self.codes >= 0)
+        matrix[answered, self.codes[answered]] = True
+        return list(self.labels), matrix
+
+class MultiChoiceColumn:
+    """Вопрос с множественным выбором: матрица "анкета x вариант" выбранных вариантов"""
+    kind = 'multi_choice'
+    
+    def __init__(self, labels, selected, answered):
+        self.labels = labels
+        self.selected = selected
+        self.answered = answered
+    
+    def summary(self, mask=None):
+        selected = self.selected if mask is None else self.selected[mask]
+        answered = self.answered if mask is None else self.answered[mask]
+        return {
+            'kind': self.kind,
+            'count': int(answered.sum()),
+            'labels': list(self.labels),
+            'counts': selected.sum(axis=0).astype(np.int64)
+        }
+
+    def matches(self, values):
+        """Маска анкет, отметивших хотя бы один из вариантов values"""
+        indexes = [index for index, label in enumerate(self.labels) if label in values]
+        return self.selected[:, indexes].any(axis=1)
+    
+    def indicators(self):
+        """Подписи вариантов и матрица анкета x вариант"""
+        return list(self.labels), self.selected
+
+class NumberColumn:
+    """Числовой вопрос (для текстовых - длины ответов): значение для каждой анкеты, NaN - нет ответа"""
+    
+    def __init__(self, kind, values):
+        self.kind = kind
+        self.values = values
+    
+    def summary(self, mask=None, bins=10):
+        values = self.values if mask is None else self.values[mask]
+        summary = {'kind': self.kind}
+        summary.update(describe(values))
+        summary['histogram'] = histogram(values, bins=bins)
+        return summary
+
+    def matches(self, values):
+        """Маска анкет с одним из значений values"""
+        return np.isin(self.values, np.asarray(values, dtype=np.float64))
+    
+    def in_range(self, low=None, high=None):
+        """Маска анкет со значением в интервале [low, high]"""
+        mask = np.isfinite(self.values)
+        if low is not None:
+            mask &= self.values >= low
+        if high is not None:
+            mask &= self.values <= high
+        return mask
+    
+    def indicators(self, bins=5):
+        """Интервалы значений и матрица анкета x интервал"""
+        _, edges = histogram(self.values, bins=bins)
+        labels = [f"{low:g} - {high:g}" for low, high in zip(edges[:-1], edges[1:])]
+        finite = np.flatnonzero(np.isfinite(self.values))
+        # Правая граница последнего интервала включается, как в np.histogram
+        codes = np.clip(np.searchsorted(edges, self.values[finite], side='right') - 1, 0, bins - 1)
+        matrix = np.zeros((len(self.values), bins), dtype=bool)
+        matrix[finite, codes] = True
+        return labels, matrix
+
+class SurveyDataset:
+    """Ответы опроса в колонках NumPy; колонки загружаются из БД при первом обращении"""
+    
+    def __init__(self, db, survey_id):
+        self.db = db
+        self.survey_id = survey_id
+        self.questions = db.get_questions(survey_id)
+        self.question_map = {q['id']: q for q in self.questions}
+        
+        self.version = None
+        self._stats = None
+        self._columns = {}
+        self._results = {}
+        self._response_ids = None
+        self._completed_at = None
+    
+    def _load_responses(self):
+        rows = self.db.get_response_dates(self.survey_id)
+        self._response_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self._completed_at = np.array([row[1] or 'NaT' for row in rows], dtype='datetime64[s]')
+    
+    @property
+    def response_ids(self):
+        """id анкет по возрастанию, строки всех колонок идут в этом порядке"""
+        if self._response_ids is None:
+            self._load_responses()
+        return self._response_ids
+    
+    @property
+    def completed_at(self):
+        """Время завершения анкет (datetime64)"""
+        if self._completed_at is None:
+            self._load_responses()
+        return self._completed_at
+    
+    def __len__(self):
+        return len(self.response_ids)
+    
+    @property
+    def stats(self):
+        """Предрасчитанная статистика вопросов из БД"""
+        if self._stats is None:
+            self._stats = self.db.get_question_stats(self.survey_id)
+        return self._stats
+    
+    def _positions(self, response_ids):
+        """Номера строк для id анкет и маска id, найденных среди анкет опроса"""
+        response_ids = np.asarray(response_ids, dtype=np.int64)
+        positions = np.searchsorted(self.response_ids, response_ids)
+        found = positions < len(self.response_ids)
+        found[found] = self.response_ids[positions[found]] == response_ids[found]
+        return positions, found
+    
+    def column(self, question_id):
+        """Колонка ответов на вопрос"""
+        column = self._columns.get(question_id)
+        if column is None:
+            column = self._columns[question_id] = self._load_column(self.question_map[question_id])
+        return column
+    
+    def _load_column(self, question):
+        count = len(self)
+        options = list(question['options'] or [])
+        kind = question_kind(question['question_type'])
+        
+        rows = self.db.get_question_answers(question['id'])
+        positions, found = self._positions([row[0] for row in rows])
+        texts = np.array([row[1] if row[1] is not None else '' for row in rows], dtype=str)
+        positions = positions[found]
+        texts = texts[found]
+        answered = texts != ''
+        positions = positions[answered]
+        texts = texts[answered]
+        
+        if kind == 'multi_choice':
+            selected = np.zeros((count, len(options)), dtype=bool)
+            option_rows = np.array(self.db.get_question_option_answers(question['id']),
+                                   dtype=np.int64).reshape(-1, 2)
+            option_positions, option_found = self._positions(option_rows[:, 0])
+            option_found &= option_rows[:, 1] < len(options)
+            selected[option_positions[option_found], option_rows[option_found, 1]] = True
+            
+            answered_mask = np.zeros(count, dtype=bool)
+            answered_mask[positions] = True
+            return MultiChoiceColumn(options, selected, answered_mask)
+        
+        if kind == 'choice':
+            # Словарное кодирование: сначала варианты вопроса, затем прочие ответы
+            labels = options
+            codes = np.full(count, -1, dtype=np.int32)
+            if texts.size:
+                unique, inverse = np.unique(texts, return_inverse=True)
+                unique = unique.tolist()
+                labels = options + [value for value in unique if value not in options]
+                lookup = {label: code for code, label in enumerate(labels)}
+                remap = np.array([lookup[value] for value in unique], dtype=np.int32)
+                codes[positions] = remap[inverse]
+            return ChoiceColumn(labels, codes)
+        
+        values = np.full(count, np.nan)
+        if kind == 'number':
+            values[positions] = _to_float(texts)
+        else:
+            values[positions] = np.char.str_len(texts)
+        return NumberColumn(kind, values)
+    
+    def _summary_from_stats(self, question, bins=10):
+        """Итоги по вопросу из question_stats: распределение "значение -> количество" """
+        stats = self.stats.get(question['id'])
+        if stats is None:
+            return None
+        
+        kind = question_kind(question['question_type'])
+        distribution = stats['distribution']
+        if kind in ('choice', 'multi_choice'):
+            options = list(question['options'] or [])
+            labels = options + [label for label in distribution if label not in options]
+            return {
+                'kind': kind,
+                'count': stats['count'],
+                'labels': labels,
+                'counts': np.array([distribution.get(label, 0) for label in labels], dtype=np.int64)
+            }
+        
+        values = np.fromiter(distribution.keys(), dtype=np.float64, count=len(distribution))
+        weights = np.fromiter(distribution.values(), dtype=np.float64, count=len(distribution))
+        summary = {'kind': kind}
+        summary.update(describe(values, weights))
+        summary['histogram'] = histogram(values, weights, bins=bins)
+        return summary
+    
+    def summary(self, question_id, mask=None):
+        """Итоги по вопросу; mask - булев массив анкет, попадающих в выборку"""
+        question = self.question_map[question_id]
+        if mask is None:
+            summary = self._summary_from_stats(question)
+            if summary is not None:
+                return summary
+        return self.column(question_id).summary(mask)
+    
+    def summaries(self, mask=None):
+        """Итоги по всем вопросам опроса: {question_id: summary}"""
+        return {q['id']: self.summary(q['id'], mask) for q in self.questions}
+
+    def filter_mask(self, by_question=None, values=None, value_range=None, date_from=None, date_to=None):
+        """Маска анкет сегмента.
+        
+        by_question и values - анкеты, ответившие на вопрос by_question одним из значений values;
+        value_range - (от, до) для числового вопроса; date_from/date_to - период
+        завершения анкеты (дата без времени в date_to включает весь день).
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if by_question is not None:
+            column = self.column(by_question)
+            if values is not None:
+                mask &= column.matches(values)
+            if value_range is not None and isinstance(column, NumberColumn):
+                mask &= column.in_range(*value_range)
+        
+        if date_from is not None:
+            mask &= self.completed_at >= np.datetime64(date_from)
+        if date_to is not None:
+            date_to = np.datetime64(date_to)
+            if date_to.dtype == np.dtype('datetime64[D]'):
+                mask &= self.completed_at < date_to + 1
+            else:
+                mask &= self.completed_at <= date_to
+        return mask
+    
+    def segment(self, question_id, **filters):
+        """Итоги по вопросу в сегменте анкет, фильтры - как в filter_mask"""
+        key = ('segment', question_id, _filter_key(filters))
+        result = self._results.get(key)
+        if result is None:
+            mask = self.filter_mask(**filters) if _filter_key(filters) else None
+            result = self._results[key] = self.summary(question_id, mask)
+        return result
+    
+    def crosstab(self, row_question_id, column_question_id, **filters):
+        """Таблица сопряженности двух вопросов в сегменте анкет.
+        
+        Возвращает словарь с подписями строк и столбцов, матрицей количеств
+        table и числом анкет, ответивших на оба вопроса.
+        """
+        key = ('crosstab', row_question_id, column_question_id, _filter_key(filters))
+        result = self._results.get(key)
+        if result is None:
+            row_labels, rows = self.column(row_question_id).indicators()
+            column_labels, columns = self.column(column_question_id).indicators()
+            if _filter_key(filters):
+                mask = self.filter_mask(**filters)
+                rows = rows[mask]
+                columns = columns[mask]
+            
+            # Количество анкет на пересечении вариантов - произведение матриц индикаторов
+            table = rows.T.astype(np.float64) @ columns.astype(np.float64)
+            result = self._results[key] = {
+                'row_labels': row_labels,
+                'column_labels': column_labels,
+                'table': table.astype(np.int64),
+                'count': int((rows.any(axis=1) & columns.any(axis=1)).sum())
+            }
+        return result
+
+def _filter_key(filters):
+    """Хешируемый ключ набора фильтров для кэша результатов"""
+    return tuple(sorted((name, tuple(value) if isinstance(value, list) else value)
+                        for name, value in filters.items() if value is not None))
+
+_datasets = OrderedDict()
+_datasets_lock = threading.Lock()
+
+def get_dataset(db, survey_id):
+    """Набор данных опроса из кэша; создается заново, когда в опросе меняются анкеты"""
+    version = db.get_survey_data_version(survey_id)
+    key = (db.db_path, survey_id)
+    with _datasets_lock:
+        dataset = _datasets.get(key)
+        if dataset is not None and dataset.version == version:
+            _datasets.move_to_end(key)
+            return dataset
+    
+    dataset = SurveyDataset(db, survey_id)
+    dataset.version = version
+    with _datasets_lock:
+        _datasets[key] = dataset
+        _datasets.move_to_end(key)
+        while len(_datasets) > DATASET_CACHE_SIZE:
+            _datasets.popitem(last=False)
+    return dataset
+
+def to_serializable(value):
+    """Приводит итоги движка к виду, пригодному для json.dumps"""
+    if isinstance(value, dict):
+        return {str(key): to_serializable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_serializable(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+if __name__ == "__main__":
+    # Отчет по опросу в формате JSON: python analytics_engine.py <survey_id>
+    import sys
+    import json
+    from database import get_database
+    
+    survey_id = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    dataset = SurveyDataset(get_database(), survey_id)
+    report = {q['question_text']: dataset.summary(q['id']) for q in dataset.questions}
+    print(json.dumps(to_serializable(report), ensure_ascii=False, indent=2))
@@ -0,0 +1,123 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Фоновая загрузка данных для окон Tk.
+# Запросы к БД выполняются в общем пуле потоков, а результаты передаются
+# в главный поток через очередь, которую окно опрашивает с помощью after():
+# виджеты Tk можно трогать только из главного потока.
+
+MAX_WORKERS = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """Общий пул потоков для загрузки данных"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="loader")
+    return _executor
+
+class LoadTask:
+    """Фоновая задача загрузки; после cancel() ее результат не будет доставлен"""
+    
+    def __init__(self, on_success, on_error=None):
+        self.on_success = on_success
+        self.on_error = on_error
+        self.cancelled = False
+        self.future = None
+    
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+class AsyncLoader:
+    """Запускает загрузку данных в фоне и вызывает обработчики в главном потоке окна"""
+    
+    # Интервал опроса очереди результатов, мс
+    POLL_INTERVAL = 30
+    
+    def __init__(self, widget):
+        self.widget = widget
+        self._results = queue.Queue()
+        self._pending = set()
+        self._poll_id = None
+        self._closed = False
+        
+        # Окно закрыто - результаты его задач больше никому не нужны
+        widget.bind("<Destroy>", self._on_destroy, add="+")
+    
+    def submit(self, func, on_success, on_error=None):
+        """Выполняет func() в фоне, затем on_success(result) или on_error(error) в главном потоке"""
+        task = LoadTask(on_success, on_error)
+        if self._closed:
+            task.cancelled = True
+            return task
+        
+        self._pending.add(task)
+        task.future = get_executor().submit(self._run, task, func)
+        if self._poll_id is None:
+            self._poll_id = self.widget.after(self.POLL_INTERVAL, self._poll)
+        return task
+    
+    def _run(self, task, func):
+        # Выполняется в потоке пула
+        if task.cancelled:
+            self._results.put((task, None, None))
+            return
+        try:
+            self._results.put((task, func(), None))
+        except Exception as e:
+            self._results.put((task, None, e))
+    
+    def _poll(self):
+        # Выполняется в главном потоке: доставляем готовые результаты
+        self._poll_id = None
+        while True:
+            try:
+                task, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            
+            self._pending.discard(task)
+            if task.cancelled or self._closed:
+                continue
+            
+            try:
+                if error is None:
+                    task.on_success(result)
+                elif task.on_error:
+                    task.on_error(error)
+                else:
+                    print(f"Ошибка загрузки данных: {error}")
+            except Exception as e:
+                print(f"Ошибка обработки загруженных данных: {e}")
+        
+        # Отмененные задачи, которые так и не начали выполняться, в очередь не попадут
+        self._pending = {task for task in self._pending if not task.future.cancelled()}
+        if self._pending and not self._closed:
+            self._poll_id = self.widget.after(self.POLL_INTERVAL, self._poll)
+    
+    def cancel_all(self):
+        """Отменяет все незавершенные задачи"""
+        for task in list(self._pending):
+            task.cancel()
+    
+    def close(self):
+        """Отменяет задачи и прекращает опрос очереди"""
+        self._closed = True
+        self.cancel_all()
+        if self._poll_id is not None:
+            try:
+                self.widget.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+    
+    def _on_destroy(self, event):
+        # <Destroy> приходит и для дочерних виджетов, нас интересует само окно
+        if str(event.widget) == str(self.widget):
+            self.close()
@@ -0,0 +1,214 @@
+import os
+import io
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Кэш отрисованных графиков аналитики.
+# График вопроса рисуется без окна (Agg) в PNG и сохраняется под ключом
+# (опрос, вопрос, версия данных). Версия данных - хеш итогов вопроса, поэтому
+# заново рисуются только графики, данные которых изменились. PNG хранятся в памяти
+# и на диске, при превышении бюджета удаляются давно не использованные.
+
+# Меняется при изменении внешнего вида графиков, чтобы не показывать старые картинки
+RENDER_VERSION = 1
+
+def data_version(summary, render_options=()):
+    """Версия данных вопроса - хеш его итогов из аналитического движка и параметров отрисовки"""
+    digest = hashlib.sha1(repr(render_options).encode('utf-8'))
+    for name in sorted(summary):
+        value = summary[name]
+        digest.update(name.encode('utf-8'))
+        if name == 'histogram':
+            for array in value:
+                digest.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+        elif isinstance(value, np.ndarray):
+            digest.update(np.ascontiguousarray(value, dtype=np.int64).tobytes())
+        else:
+            digest.update(json.dumps(value, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+def render_chart_png(summary, color, size=(8, 4), dpi=100):
+    """Рисует график по итогам вопроса и возвращает PNG"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    fig = Figure(figsize=size, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    kind = summary['kind']
+    
+    if kind in ['choice', 'multi_choice']:
+        # Для вариантов ответов - столбчатая диаграмма
+        counts = summary['counts']
+        
+        # Показываем выбранные варианты, не больше 10 самых частых
+        order = np.argsort(-counts, kind='stable')
+        order = order[counts[order] > 0][:10]
+        if len(summary['labels']) <= 10:
+            order = np.sort(order)
+        labels = [summary['labels'][i] for i in order]
+        values = counts[order].tolist()
+        
+        # Горизонтальная столбчатая диаграмма для лучшей читаемости длинных меток
+        y_pos = np.arange(len(labels))
+        ax.barh(y_pos, values, align='center', color=color)
+        ax.set_yticks(y_pos)
+        ax.set_yticklabels(labels)
+        ax.invert_yaxis()  # Метки сверху вниз
+        ax.set_xlabel('Количество')
+        ax.set_title('Распределение ответов')
+        
+        # Добавляем числовые значения на столбцы
+        for i, v in enumerate(values):
+            ax.text(v + 0.1, i, str(v), color='black', va='center')
+    else:
+        # Гистограмма значений или длин ответов уже посчитана движком
+        counts, edges = summary['histogram']
+        ax.hist(edges[:-1], bins=edges, weights=counts, color=color)
+        ax.set_ylabel('Частота')
+        if kind == 'text':
+            ax.set_xlabel('Длина ответа (символов)')
+            ax.set_title('Распределение длин ответов')
+        else:
+            ax.set_xlabel('Значение')
+            ax.set_title('Распределение числовых ответов')
+    
+    fig.tight_layout()
+    
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    fig.clear()
+    return buffer.getvalue()
+
+class ChartCache:
+    """LRU-кэш PNG графиков в памяти и на диске с ограничением по объему"""
+    
+    def __init__(self, directory, memory_budget=16 * 1024 * 1024, disk_budget=64 * 1024 * 1024):
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = None
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(survey_id, question_id, version):
+        """Ключ графика: опрос, вопрос, версия данных и версия отрисовки"""
+        return f"s{survey_id}_q{question_id}_{version}_r{RENDER_VERSION}"
+    
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".png")
+    
+    def _load_disk_index(self):
+        # Файлы на диске в порядке последнего использования (по времени изменения)
+        self._disk = OrderedDict()
+        self._disk_size = 0
+        if not os.path.isdir(self.directory):
+            return
+        
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".png"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+    
+    def _remember(self, key, data):
+        # Кладем в память, вытесняя давно не использованные
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_budget and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+    
+    def get(self, key):
+        """PNG графика или None, если его нет в кэше"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+            
+            if self._disk is None:
+                self._load_disk_index()
+            
+            if key in self._disk:
+                try:
+                    with open(self._path(key), 'rb') as f:
+                        data = f.read()
+                    os.utime(self._path(key))
+                    self._disk.move_to_end(key)
+                    self._remember(key, data)
+                    self.hits += 1
+                    return data
+                except OSError:
+                    self._disk_size -= self._disk.pop(key)
+            
+            self.misses += 1
+            return None
+    
+    def put(self, key, data):
+        """Сохраняет PNG графика в памяти и на диске"""
+        with self._lock:
+            self._remember(key, data)
+            
+            if self._disk is None:
+                self._load_disk_index()
+            
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self._path(key), 'wb') as f:
+                    f.write(data)
+            except OSError as e:
+                print(f"Ошибка сохранения графика в кэш: {e}")
+                return
+            
+            if key in self._disk:
+                self._disk_size -= self._disk.pop(key)
+            self._disk[key] = len(data)
+            self._disk_size += len(data)
+            
+            # Удаляем с диска давно не использованные графики
+            while self._disk_size > self.disk_budget and len(self._disk) > 1:
+                evicted, size = self._disk.popitem(last=False)
+                self._disk_size -= size
+                try:
+                    os.remove(self._path(evicted))
+                except OSError:
+                    pass
+    
+    def get_or_render(self, survey_id, question_id, summary, color, size=(8, 4), dpi=100):
+        """PNG графика вопроса из кэша; рисует и сохраняет его, если данные изменились"""
+        key = self.make_key(survey_id, question_id, data_version(summary, (color, size, dpi)))
+        data = self.get(key)
+        if data is None:
+            data = render_chart_png(summary, color, size, dpi)
+            self.put(key, data)
+        return data
+
+_chart_caches = {}
+_chart_caches_lock = threading.Lock()
+
+def get_chart_cache(db):
+    """Общий кэш графиков для БД; файлы лежат рядом с ней в chart_cache"""
+    directory = os.path.join(os.path.dirname(db.db_path), "chart_cache")
+    with _chart_caches_lock:
+        cache = _chart_caches.get(directory)
+        if cache is None:
+            cache = _chart_caches[directory] = ChartCache(directory)
+    return cache
@@ -1,12 +1,35 @@
 import sys
 import os
+import time
+
+# Момент запуска - от него считается время до отрисовки главного окна
+STARTED_AT = time.perf_counter()
 
 # Добавляем путь к модулям
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from startup_profile import start_profiling
+
+# Профилирование запуска: --profile [файл] или SURVEYS_PROFILE=файл
+profiler = start_profiling(sys.argv[1:], STARTED_AT) if __name__ == "__main__" else None
+
 from window_core import Application
 
 if __name__ == "__main__":
-    app = Application()
-    app.create_window()
-    app.start()
\ No newline at end of file
+    if profiler:
+        profiler.mark('imports_done')
+        profiler.instrument()
+    
+    # SURVEYS_PREWARM=0 отключает фоновую загрузку модулей аналитики после запуска
+    app = Application(started_at=STARTED_AT, prewarm=os.environ.get("SURVEYS_PREWARM", "1") != "0")
+    try:
+        if profiler:
+            profiler.app = app
+        app.create_window()
+        if profiler:
+            profiler.mark('window_created')
+        app.start()
+    finally:
+        if profiler:
+            profiler.remove_import_hook()
+            profiler.write()
\ No newline at end of file
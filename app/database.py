@@ -2,9 +2,341 @@ import sqlite3
 import os
 import datetime
 import json
+import math
+import threading
+import itertools
+import time
+import random
+import re
+from contextlib import contextmanager
+from collections import OrderedDict
+import migrations
+from survey_cache import CompiledSurvey, SurveyCache
+from query_stats import QueryStats, InstrumentedConnection, SLOW_QUERY_THRESHOLD, instrument_methods
+
+# Настройки хранилища SQLite по умолчанию (применяются к каждому соединению)
+DEFAULT_STORAGE = {
+    'busy_timeout': 5000,              # мс ожидания блокировки внутри SQLite
+    'journal_mode': 'WAL',             # читатели не блокируют писателей
+    'synchronous': 'NORMAL',           # в режиме WAL надежно и без fsync на каждый коммит
+    'cache_size': -16000,              # размер кэша страниц, отрицательное значение - в КиБ
+    'mmap_size': 64 * 1024 * 1024,     # байт файла, читаемых через mmap
+    'foreign_keys': 1,
+}
+
+def is_busy_error(error):
+    """Проверяет, что ошибка SQLite вызвана занятой другим соединением БД"""
+    name = getattr(error, 'sqlite_errorname', '') or ''
+    return (name.startswith('SQLITE_BUSY') or name.startswith('SQLITE_LOCKED')
+            or 'database is locked' in str(error))
+
+def split_checkbox_answer(answer_text, options):
+    """Разбирает ответ с множественным выбором на индексы выбранных вариантов.
+    
+    Ответ хранится как ', '.join(выбранные варианты) в порядке списка вариантов,
+    и варианты сопоставляются жадно по порядку. Разбор неоднозначен, если один
+    вариант с ", " - начало другого (варианты 'a' и 'a, b'), поэтому выбранные
+    варианты сохраненных ответов берутся из answer_options, а этот разбор нужен
+    только для ответов, переданных текстом, и старых ответов без answer_options.
+    """
+    selected = []
+    rest = answer_text or ''
+    for index, option in enumerate(options or []):
+        if rest == option:
+            selected.append(index)
+            break
+        if rest.startswith(option + ', '):
+            selected.append(index)
+            rest = rest[len(option) + 2:]
+    return selected
+
+def make_fts_query(text):
+    """Строка поиска -> запрос FTS5: все слова должны встретиться, каждое ищется как префикс"""
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text or ''))
+
+# Типы вопросов с выбором из готовых вариантов
+CHOICE_TYPES = ('radio', 'checkbox', 'select')
+
+def collect_question_stats(questions, answer_rows):
+    """Считает приращения статистики вопросов для пачки ответов.
+    
+    questions - {question_id: (question_type, options)}, answer_rows - пары
+    (question_id, answer_text) или тройки (question_id, answer_text, option_indexes),
+    если индексы выбранных вариантов уже известны. Результат - {(question_id, bucket): [count, total,
+    total_sq, min, max]}, где bucket '' - итог по вопросу, остальные - распределение:
+    вариант ответа, числовое значение или длина текстового ответа.
+    """
+    deltas = {}
+    
+    def add(question_id, bucket, value=None):
+        entry = deltas.get((question_id, bucket))
+        if entry is None:
+            entry = deltas[(question_id, bucket)] = [0, 0.0, 0.0, None, None]
+        entry[0] += 1
+        if value is not None:
+            entry[1] += value
+            entry[2] += value * value
+            if entry[3] is None or value < entry[3]:
+                entry[3] = value
+            if entry[4] is None or value > entry[4]:
+                entry[4] = value
+    
+    for row in answer_rows:
+        question_id, answer_text = row[0], row[1]
+        if question_id not in questions or answer_text is None or answer_text == '':
+            continue
+        
+        question_type, options = questions[question_id]
+        if question_type == 'checkbox':
+            indexes = row[2] if len(row) > 2 else split_checkbox_answer(answer_text, options)
+            add(question_id, '')
+            for index in indexes:
+                add(question_id, options[index])
+        elif question_type in CHOICE_TYPES:
+            add(question_id, '')
+            add(question_id, answer_text)
+        elif question_type == 'number':
+            try:
+                value = float(answer_text)
+            except ValueError:
+                continue
+            # "nan" и "inf" float принимает, но NaN в SQLite сохраняется как NULL
+            # и портит сумму по вопросу
+            if not math.isfinite(value):
+                continue
+            add(question_id, '', value)
+            add(question_id, repr(value))
+        else:
+            length = len(answer_text)
+            add(question_id, '', length)
+            add(question_id, str(length))
+    
+    return deltas
+
+def normalize_checkbox_answer(answer, options):
+    """Приводит ответ с множественным выбором к (текст, индексы выбранных вариантов).
+    
+    Ответ может быть списком индексов или текстов вариантов, либо строкой
+    в формате ', '.join(выбранные варианты). Строка сохраняется как есть, даже
+    если разобрать удалось не все варианты (импорт из CSV, другой регистр):
+    индексы получают только распознанные варианты, остальной текст не теряется.
+    """
+    if not isinstance(answer, (list, tuple)):
+        return answer, split_checkbox_answer(answer, options)
+    
+    indexes = set()
+    unknown = []
+    for item in answer:
+        if isinstance(item, int):
+            if 0 <= item < len(options):
+                indexes.add(item)
+        elif item in options:
+            indexes.add(options.index(item))
+        elif item not in (None, ''):
+            unknown.append(str(item))
+    indexes = sorted(indexes)
+    
+    return ', '.join([options[index] for index in indexes] + unknown), indexes
+
+def apply_question_stats(c, deltas):
+    """Добавляет приращения статистики в таблицу question_stats"""
+    c.executemany("""
+        INSERT INTO question_stats (question_id, bucket, count, total, total_sq, min_value, max_value)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (question_id, bucket) DO UPDATE SET
+            count = count + excluded.count,
+            total = total + excluded.total,
+            total_sq = total_sq + excluded.total_sq,
+            min_value = CASE WHEN min_value IS NULL OR excluded.min_value < min_value
+                             THEN excluded.min_value ELSE min_value END,
+            max_value = CASE WHEN max_value IS NULL OR excluded.max_value > max_value
+                             THEN excluded.max_value ELSE max_value END
+    """, [(question_id, bucket) + tuple(entry) for (question_id, bucket), entry in deltas.items()])
+
+def load_question_types(c, question_ids=None):
+    """Типы и варианты ответа вопросов: {question_id: (question_type, options)}"""
+    if question_ids is None:
+        c.execute("SELECT id, question_type, options FROM questions")
+        rows = c.fetchall()
+    else:
+        ids = list(set(question_ids))
+        rows = []
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            c.execute(f"SELECT id, question_type, options FROM questions WHERE id IN ({placeholders})", chunk)
+            rows.extend(c.fetchall())
+    
+    return {question_id: (question_type, json.loads(options) if options else [])
+            for question_id, question_type, options in rows}
+
+def rebuild_question_stats(c, chunk_size=10000):
+    """Пересчитывает таблицу question_stats по всем сохраненным ответам"""
+    questions = load_question_types(c)
+    c.execute("DELETE FROM question_stats")
+    
+    reader = c.connection.cursor()
+    reader.execute("SELECT question_id, answer_text FROM answers")
+    while True:
+        rows = reader.fetchmany(chunk_size)
+        if not rows:
+            break
+        apply_question_stats(c, collect_question_stats(questions, rows))
+
+class ConnectionPool:
+    """Пул соединений SQLite: ограниченный набор соединений, у каждого потока своё"""
+    
+    # Через сколько возвратов соединений в пул обновлять статистику планировщика
+    OPTIMIZE_INTERVAL = 1000
+    
+    def __init__(self, db_path, max_connections=5, timeout=10.0, pragmas=None,
+                 factory=sqlite3.Connection, query_stats=None, optimize_interval=OPTIMIZE_INTERVAL):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.pragmas = pragmas or {}
+        self.optimize_interval = optimize_interval
+        self._releases = itertools.count(1)
+        
+        # Класс соединений и статистика запросов, которую они пополняют
+        self.factory = factory
+        self.query_stats = query_stats
+        
+        self._idle = []
+        self._created = 0
+        self._condition = threading.Condition()
+        self._local = threading.local()
+    
+    def _connect(self):
+        # Транзакциями управляем сами (BEGIN/COMMIT), поэтому режим автокоммита.
+        # Соединение может переходить между потоками, но одновременно
+        # его использует только один поток
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False,
+                               factory=self.factory)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        if self.query_stats is not None:
+            conn.query_stats = self.query_stats
+        return conn
+    
+    def acquire(self):
+        """Выдает соединение текущему потоку (повторный вызов вернет то же соединение)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.depth += 1
+            return conn
+        
+        with self._condition:
+            available = self._condition.wait_for(
+                lambda: self._idle or self._created < self.max_connections,
+                self.timeout)
+            if not available:
+                raise sqlite3.OperationalError("Нет свободных соединений с базой данных")
+            
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                self._created += 1
+        
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._condition:
+                    self._created -= 1
+                    self._condition.notify()
+                raise
+        
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+    
+    def release(self):
+        """Возвращает соединение текущего потока в пул"""
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        
+        conn = self._local.conn
+        self._local.conn = None
+        
+        # Незавершенную транзакцию не оставляем следующему владельцу
+        if conn.in_transaction:
+            conn.rollback()
+        
+        if self.optimize_interval and next(self._releases) % self.optimize_interval == 0:
+            self._optimize(conn)
+        
+        with self._condition:
+            self._idle.append(conn)
+            self._condition.notify()
+    
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release()
+    
+    def _optimize(self, conn):
+        # PRAGMA optimize пересчитывает статистику (ANALYZE) только для таблиц,
+        # которые запрашивались через это соединение и заметно выросли с прошлого раза.
+        # Выполняется мимо статистики запросов
+        try:
+            sqlite3.Connection.execute(conn, "PRAGMA optimize")
+        except sqlite3.Error as e:
+            print(f"Ошибка обновления статистики БД: {e}")
+    
+    def close_all(self):
+        """Закрывает все простаивающие соединения, обновив перед этим статистику планировщика"""
+        with self._condition:
+            while self._idle:
+                conn = self._idle.pop()
+                self._optimize(conn)
+                conn.close()
+                self._created -= 1
+            self._condition.notify_all()
 
 class Database:
-    def __init__(self, db_name="app_database.db"):
+    # Сколько пользователей помнит кэш учетных данных
+    IDENTITY_CACHE_SIZE = 256
+    
+    def __init__(self, db_name="app_database.db", max_connections=5, storage=None,
+                 retry_attempts=8, retry_delay=0.02, slow_query_threshold=SLOW_QUERY_THRESHOLD):
+        # Путь к БД
+        self.db_path = self.resolve_path(db_name)
+        
+        # Настройки хранилища и повторов при занятой БД
+        self.storage = dict(DEFAULT_STORAGE, **(storage or {}))
+        self.retry_attempts = retry_attempts
+        self.retry_delay = retry_delay
+        
+        # Пул соединений, через который выполняются все запросы
+        # Статистика запросов и журнал медленных вызовов (см. query_stats)
+        self.query_stats = QueryStats(slow_query_threshold, explain=self._explain_query)
+        
+        self.pool = ConnectionPool(self.db_path, max_connections, pragmas=self.storage,
+                                   factory=InstrumentedConnection, query_stats=self.query_stats)
+        
+        # Наличие полнотекстовых индексов (проверяется при первом поиске)
+        self._fts_tables = {}
+        
+        # Скомпилированные опросы для прохождения (сбрасываются при изменении опроса)
+        self.survey_cache = SurveyCache()
+        
+        # Кэш учетных данных: имя пользователя -> (id, is_admin, created_at).
+        # Заполняется при входе и сбрасывается при регистрации и удалении пользователей
+        self._identities = OrderedDict()
+        self._identity_lock = threading.Lock()
+        self._identity_generation = 0
+        
+        # Создаем БД и таблицы, если они не существуют
+        self.initialize_db()
+    
+    @staticmethod
+    def resolve_path(db_name):
+        """Возвращает полный путь к файлу БД в директории данных приложения"""
         # Определяем путь к директории приложения
         app_dir = os.path.dirname(os.path.abspath(__file__))
         data_dir = os.path.join(app_dir, "data")
@@ -13,124 +345,195 @@ class Database:
         if not os.path.exists(data_dir):
             os.makedirs(data_dir)
         
-        # Путь к БД
-        self.db_path = os.path.join(data_dir, db_name)
-        
-        # Создаем БД и таблицы, если они не существуют
-        self.initialize_db()
+        return os.path.abspath(os.path.join(data_dir, db_name))
+    
+    def connection(self):
+        """Соединение из пула для чтения (контекстный менеджер)"""
+        return self.pool.connection()
+    
+    @contextmanager
+    def transaction(self):
+        """Выполняет несколько запросов в одной транзакции на соединении из пула"""
+        with self.pool.connection() as conn:
+            if conn.in_transaction:
+                # Вложенная транзакция - откатывается отдельно через точку сохранения
+                conn.execute("SAVEPOINT nested")
+                try:
+                    yield conn
+                except BaseException:
+                    conn.execute("ROLLBACK TO nested")
+                    conn.execute("RELEASE nested")
+                    raise
+                conn.execute("RELEASE nested")
+                return
+            
+            # IMMEDIATE сразу берет блокировку записи, чтобы параллельные
+            # писатели ждали друг друга, а не падали при повышении блокировки
+            self._retry_busy(lambda: conn.execute("BEGIN IMMEDIATE"))
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            self._retry_busy(conn.commit)
+    
+    def _retry_busy(self, operation):
+        """Повторяет операцию, пока БД занята другим процессом, с растущей задержкой"""
+        delay = self.retry_delay
+        for attempt in range(self.retry_attempts):
+            try:
+                return operation()
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or attempt == self.retry_attempts - 1:
+                    raise
+                time.sleep(delay * random.uniform(0.5, 1.5))
+                delay *= 2
+    
+    def close(self):
+        """Закрывает соединения пула"""
+        self.pool.close_all()
+    
+    def get_query_stats(self):
+        """Снимок статистики запросов: по методам и журнал медленных вызовов"""
+        return self.query_stats.snapshot()
+    
+    def reset_query_stats(self):
+        self.query_stats.reset()
+    
+    def _explain_query(self, sql, params):
+        # План запроса для журнала медленных вызовов; выполняется мимо инструментирования
+        with self.pool.connection() as conn:
+            rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params or ()).fetchall()
+        return [row[3] for row in rows]
     
     def initialize_db(self):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        
-        # Таблица пользователей
-        c.execute('''CREATE TABLE IF NOT EXISTS users 
-                     (id INTEGER PRIMARY KEY, username TEXT UNIQUE, 
-                      password TEXT, is_admin INTEGER, created_at TEXT)''')
-        
-        # Таблица опросов
-        c.execute('''CREATE TABLE IF NOT EXISTS surveys
-                     (id INTEGER PRIMARY KEY, title TEXT, description TEXT,
-                      creator_id INTEGER, created_at TEXT, 
-                      is_active INTEGER DEFAULT 1,
-                      FOREIGN KEY (creator_id) REFERENCES users (id))''')
-        
-        # Таблица вопросов
-        c.execute('''CREATE TABLE IF NOT EXISTS questions
-                     (id INTEGER PRIMARY KEY, survey_id INTEGER,
-                      question_text TEXT, question_type TEXT,
-                      required INTEGER DEFAULT 1, options TEXT,
-                      position INTEGER,
-                      FOREIGN KEY (survey_id) REFERENCES surveys (id))''')
-        
-        # Таблица ответов
-        c.execute('''CREATE TABLE IF NOT EXISTS responses
-                     (id INTEGER PRIMARY KEY, survey_id INTEGER,
-                      respondent_id INTEGER, started_at TEXT,
-                      completed_at TEXT,
-                      FOREIGN KEY (survey_id) REFERENCES surveys (id),
-                      FOREIGN KEY (respondent_id) REFERENCES users (id))''')
-        
-        # Таблица ответов на вопросы
-        c.execute('''CREATE TABLE IF NOT EXISTS answers
-                     (id INTEGER PRIMARY KEY, response_id INTEGER,
-                      question_id INTEGER, answer_text TEXT,
-                      FOREIGN KEY (response_id) REFERENCES responses (id),
-                      FOREIGN KEY (question_id) REFERENCES questions (id))''')
-        
-        conn.commit()
-        conn.close()
+        # Схема уже актуальна - никаких DDL-запросов не нужно
+        with self.connection() as conn:
+            if migrations.get_schema_version(conn) >= migrations.SCHEMA_VERSION:
+                return
+        
+        # Создаем таблицы и индексы, доводя схему до актуальной версии
+        migrations.migrate(self)
         
         # Добавляем администратора, если он еще не существует
         if not self.get_user_by_name("admin"):
             self.register_user("admin", "admin", is_admin=1)
     
     # Методы для работы с пользователями
+    def _remember_identity(self, username, user_id, is_admin, created_at, generation=None):
+        """Запоминает учетные данные пользователя, вытесняя давно не использованные"""
+        with self._identity_lock:
+            # Пользователя успели удалить или зарегистрировать, пока шел запрос
+            if generation is not None and generation != self._identity_generation:
+                return
+            self._identities[username] = (user_id, is_admin, created_at)
+            self._identities.move_to_end(username)
+            while len(self._identities) > self.IDENTITY_CACHE_SIZE:
+                self._identities.popitem(last=False)
+    
+    def _forget_identity(self, username=None, user_id=None):
+        """Сбрасывает учетные данные пользователя из кэша по имени или id"""
+        with self._identity_lock:
+            self._identity_generation += 1
+            if username is not None:
+                self._identities.pop(username, None)
+            if user_id is not None:
+                for name, identity in list(self._identities.items()):
+                    if identity[0] == user_id:
+                        del self._identities[name]
+    
+    def get_identity(self, username):
+        """Учетные данные пользователя (id, is_admin, created_at) из кэша или БД, None - нет такого"""
+        with self._identity_lock:
+            identity = self._identities.get(username)
+            if identity is not None:
+                self._identities.move_to_end(username)
+                return identity
+            generation = self._identity_generation
+        
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT id, is_admin, created_at FROM users WHERE username = ?", (username,))
+            row = c.fetchone()
+        if row is None:
+            return None
+        
+        self._remember_identity(username, *row, generation=generation)
+        return tuple(row)
+    
     def register_user(self, username, password, is_admin=0):
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            c.execute("INSERT INTO users (username, password, is_admin, created_at) VALUES (?, ?, ?, ?)",
-                     (username, password, is_admin, now))
-            conn.commit()
-            conn.close()
+            with self.transaction() as conn:
+                c = conn.cursor()
+                now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                c.execute("INSERT INTO users (username, password, is_admin, created_at) VALUES (?, ?, ?, ?)",
+                         (username, password, is_admin, now))
             return True
         except sqlite3.IntegrityError:
-            conn.close()
             return False
+        finally:
+            self._forget_identity(username)
     
     def validate_login(self, username, password):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("SELECT * FROM users WHERE username = ? AND password = ?", (username, password))
-        user = c.fetchone()
-        conn.close()
+        with self._identity_lock:
+            generation = self._identity_generation
+        
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT id, is_admin, created_at FROM users WHERE username = ? AND password = ?",
+                     (username, password))
+            user = c.fetchone()
+        
+        # Вошедший пользователь дальше определяется по кэшу, без запросов к БД
+        if user is not None:
+            self._remember_identity(username, *user, generation=generation)
         return user is not None
     
     def is_admin(self, username):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("SELECT is_admin FROM users WHERE username = ?", (username,))
-        result = c.fetchone()
-        conn.close()
-        return result and result[0] == 1
+        identity = self.get_identity(username)
+        return identity is not None and identity[1] == 1
     
     def get_user_by_name(self, username):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("SELECT * FROM users WHERE username = ?", (username,))
-        user = c.fetchone()
-        conn.close()
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT * FROM users WHERE username = ?", (username,))
+            user = c.fetchone()
         return user
     
     def get_user_id(self, username):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("SELECT id FROM users WHERE username = ?", (username,))
-        user_id = c.fetchone()
-        conn.close()
-        return user_id[0] if user_id else None
+        identity = self.get_identity(username)
+        return identity[0] if identity else None
     
     def get_all_users(self):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("SELECT id, username, is_admin, created_at FROM users")
-        users = c.fetchall()
-        conn.close()
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT id, username, is_admin, created_at FROM users")
+            users = c.fetchall()
         return users
     
     def delete_user(self, user_id):
+        """Удаляет пользователя; его ответы на опросы остаются анонимными.
+        
+        Пользователя, создавшего опросы, удалить нельзя: опросы ссылаются на
+        него внешним ключом, и удаление отклоняется (возвращается False).
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            c.execute("DELETE FROM users WHERE id = ?", (user_id,))
-            conn.commit()
-            conn.close()
+            with self.transaction() as conn:
+                c = conn.cursor()
+                c.execute("SELECT COUNT(*) FROM surveys WHERE creator_id = ?", (user_id,))
+                surveys_count = c.fetchone()[0]
+                if surveys_count:
+                    print(f"Ошибка удаления пользователя {user_id}: он создал опросов: {surveys_count}")
+                    return False
+                
+                c.execute("UPDATE responses SET respondent_id = NULL WHERE respondent_id = ?", (user_id,))
+                c.execute("DELETE FROM users WHERE id = ?", (user_id,))
             return True
-        except:
-            conn.close()
+        except sqlite3.Error as e:
+            print(f"Ошибка удаления пользователя: {e}")
             return False
+        finally:
+            self._forget_identity(user_id=user_id)
     
     # Методы для работы с опросами
     def create_survey(self, title, description, creator_username):
@@ -139,139 +542,352 @@ class Database:
             if not creator_id:
                 return False
             
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            c.execute("""INSERT INTO surveys (title, description, creator_id, created_at, is_active) 
-                       VALUES (?, ?, ?, ?, 1)""", (title, description, creator_id, now))
-            survey_id = c.lastrowid
-            conn.commit()
-            conn.close()
+            with self.transaction() as conn:
+                c = conn.cursor()
+                now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                c.execute("""INSERT INTO surveys (title, description, creator_id, created_at, is_active)
+                           VALUES (?, ?, ?, ?, 1)""", (title, description, creator_id, now))
+                survey_id = c.lastrowid
+            return survey_id
+        except Exception as e:
+            print(f"Ошибка создания опроса: {e}")
+            return False
+    
+    def create_survey_with_questions(self, title, description, creator_username, questions):
+        """Создает опрос вместе со всеми вопросами в одной транзакции"""
+        try:
+            creator_id = self.get_user_id(creator_username)
+            if not creator_id:
+                return False
+            
+            with self.transaction() as conn:
+                c = conn.cursor()
+                now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                c.execute("""INSERT INTO surveys (title, description, creator_id, created_at, is_active)
+                           VALUES (?, ?, ?, ?, 1)""", (title, description, creator_id, now))
+                survey_id = c.lastrowid
+                
+                # Позиции вопросов задаются порядком в списке
+                c.executemany("""INSERT INTO questions (survey_id, question_text, question_type, required, options, position) 
+                               VALUES (?, ?, ?, ?, ?, ?)""",
+                             [(survey_id, question['question_text'], question['question_type'],
+                               question.get('required', 1),
+                               json.dumps(question['options']) if question.get('options') else None,
+                               position)
+                              for position, question in enumerate(questions, 1)])
             return survey_id
         except Exception as e:
             print(f"Ошибка создания опроса: {e}")
             return False
     
     def get_survey(self, survey_id):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        c.execute("SELECT * FROM surveys WHERE id = ?", (survey_id,))
-        survey = dict(c.fetchone()) if c.fetchone() else None
-        conn.close()
-        return survey
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.row_factory = sqlite3.Row
+            c.execute("SELECT * FROM surveys WHERE id = ?", (survey_id,))
+            row = c.fetchone()
+        return dict(row) if row else None
+    
+    def get_compiled_survey(self, survey_id):
+        """Опрос с вопросами и правилами проверки ответов из кэша (CompiledSurvey) или None"""
+        return self.survey_cache.get(survey_id, self._compile_survey)
+    
+    def _compile_survey(self, survey_id):
+        # Строка опроса и вопросы читаются на одном соединении
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.row_factory = sqlite3.Row
+            c.execute("SELECT * FROM surveys WHERE id = ?", (survey_id,))
+            survey = c.fetchone()
+            if survey is None:
+                return None
+            c.execute("SELECT * FROM questions WHERE survey_id = ? ORDER BY position", (survey_id,))
+            rows = c.fetchall()
+        
+        questions = []
+        for row in rows:
+            question = dict(row)
+            question['options'] = json.loads(question['options']) if question['options'] else None
+            questions.append(question)
+        return CompiledSurvey(survey, questions)
     
     def get_all_surveys(self, active_only=False):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        query = "SELECT * FROM surveys"
+        with self.connection() as conn:
+            c = conn.cursor()
+            query = "SELECT * FROM surveys"
+            if active_only:
+                query += " WHERE is_active = 1"
+            c.execute(query)
+            surveys = c.fetchall()
+        return surveys
+    
+    def has_fts_table(self, name):
+        """Есть ли в БД полнотекстовый индекс (FTS5) с таким именем"""
+        if name not in self._fts_tables:
+            with self.connection() as conn:
+                row = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+            self._fts_tables[name] = row is not None
+        return self._fts_tables[name]
+    
+    def has_survey_search(self):
+        """Есть ли в БД полнотекстовый индекс опросов"""
+        return self.has_fts_table('surveys_fts')
+    
+    def get_surveys_page(self, active_only=True, before_id=None, limit=20, search=None):
+        """Страница каталога опросов, от новых к старым (постраничная выборка по ключу).
+        
+        before_id - id последнего опроса предыдущей страницы, search - слова для поиска
+        по названию и описанию. Описание обрезается до 200 символов. Строки в том же
+        формате, что у get_all_surveys: (id, title, description, creator_id, created_at, is_active).
+        """
+        conditions = []
+        params = []
         if active_only:
-            query += " WHERE is_active = 1"
-        c.execute(query)
-        surveys = c.fetchall()
-        conn.close()
+            conditions.append("s.is_active = 1")
+        
+        source = "surveys s"
+        key = "s.id"
+        search = (search or '').strip()
+        fts_query = make_fts_query(search) if search and self.has_survey_search() else ''
+        if fts_query:
+            # Совпадения перебираются по FTS-индексу в порядке rowid (CROSS JOIN
+            # фиксирует порядок таблиц), а опросы достаются по первичному ключу
+            source = "surveys_fts f CROSS JOIN surveys s ON s.id = f.rowid"
+            key = "f.rowid"
+            conditions.insert(0, "surveys_fts MATCH ?")
+            params.insert(0, fts_query)
+        elif search:
+            conditions.append("(s.title LIKE ? OR s.description LIKE ?)")
+            params.extend([f"%{search}%", f"%{search}%"])
+        
+        if before_id is not None:
+            conditions.append(f"{key} < ?")
+            params.append(before_id)
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute(f"""
+                SELECT s.id, s.title, substr(s.description, 1, 200), s.creator_id, s.created_at, s.is_active
+                FROM {source}
+                {where}
+                ORDER BY {key} DESC
+                LIMIT ?
+            """, params + [limit])
+            surveys = c.fetchall()
         return surveys
     
     def get_user_surveys(self, username):
         user_id = self.get_user_id(username)
         if not user_id:
             return []
-            
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("SELECT * FROM surveys WHERE creator_id = ?", (user_id,))
-        surveys = c.fetchall()
-        conn.close()
+        
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT * FROM surveys WHERE creator_id = ?", (user_id,))
+            surveys = c.fetchall()
         return surveys
     
+    def get_survey_response_counts(self, username=None):
+        """Количество ответов и дата последнего ответа по опросам пользователя (или по всем опросам)"""
+        with self.connection() as conn:
+            c = conn.cursor()
+            query = """SELECT s.id, COUNT(r.id), MAX(r.completed_at)
+                       FROM surveys s
+                       LEFT JOIN responses r ON r.survey_id = s.id"""
+            params = ()
+            if username is not None:
+                query += " WHERE s.creator_id = (SELECT id FROM users WHERE username = ?)"
+                params = (username,)
+            query += " GROUP BY s.id"
+            c.execute(query, params)
+            rows = c.fetchall()
+        
+        return {survey_id: {'responses': count, 'last_response': last_response}
+                for survey_id, count, last_response in rows}
+    
     def add_question(self, survey_id, question_text, question_type, required=1, options=None, position=None):
         try:
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            
-            # Определяем позицию для нового вопроса, если не указана
-            if position is None:
-                c.execute("SELECT MAX(position) FROM questions WHERE survey_id = ?", (survey_id,))
-                max_pos = c.fetchone()[0]
-                position = 1 if max_pos is None else max_pos + 1
-            
-            # Конвертируем список опций в JSON, если они есть
-            options_json = json.dumps(options) if options else None
-            
-            c.execute("""INSERT INTO questions (survey_id, question_text, question_type, required, options, position) 
-                       VALUES (?, ?, ?, ?, ?, ?)""", 
-                     (survey_id, question_text, question_type, required, options_json, position))
-            
-            question_id = c.lastrowid
-            conn.commit()
-            conn.close()
+            with self.transaction() as conn:
+                c = conn.cursor()
+                
+                # Определяем позицию для нового вопроса, если не указана
+                if position is None:
+                    c.execute("SELECT MAX(position) FROM questions WHERE survey_id = ?", (survey_id,))
+                    max_pos = c.fetchone()[0]
+                    position = 1 if max_pos is None else max_pos + 1
+                
+                # Конвертируем список опций в JSON, если они есть
+                options_json = json.dumps(options) if options else None
+                
+                c.execute("""INSERT INTO questions (survey_id, question_text, question_type, required, options, position)
+                           VALUES (?, ?, ?, ?, ?, ?)""",
+                         (survey_id, question_text, question_type, required, options_json, position))
+                
+                question_id = c.lastrowid
+            self.survey_cache.invalidate(survey_id)
             return question_id
         except Exception as e:
             print(f"Ошибка добавления вопроса: {e}")
             return False
     
     def get_questions(self, survey_id):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        c.execute("SELECT * FROM questions WHERE survey_id = ? ORDER BY position", (survey_id,))
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.row_factory = sqlite3.Row
+            c.execute("SELECT * FROM questions WHERE survey_id = ? ORDER BY position", (survey_id,))
+            rows = c.fetchall()
         
         questions = []
-        for question in c.fetchall():
+        for question in rows:
             q_dict = dict(question)
             # Распаковываем JSON с опциями, если они есть
             if q_dict['options']:
                 q_dict['options'] = json.loads(q_dict['options'])
             questions.append(q_dict)
         
-        conn.close()
         return questions
     
     def save_response(self, survey_id, respondent_username, answers):
         try:
-            respondent_id = self.get_user_id(respondent_username)
-            
-            conn = sqlite3.connect(self.db_path)
-            c = conn.cursor()
-            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # Создаем запись ответа на опрос
-            c.execute("""INSERT INTO responses (survey_id, respondent_id, started_at, completed_at) 
-                       VALUES (?, ?, ?, ?)""", (survey_id, respondent_id, now, now))
-            response_id = c.lastrowid
-            
-            # Сохраняем ответы на вопросы
-            for question_id, answer_text in answers.items():
-                c.execute("""INSERT INTO answers (response_id, question_id, answer_text) 
-                           VALUES (?, ?, ?)""", (response_id, question_id, answer_text))
-            
-            conn.commit()
-            conn.close()
+            with self.transaction() as conn:
+                self._insert_responses(conn.cursor(), [{
+                    'survey_id': survey_id,
+                    'respondent': respondent_username,
+                    'answers': answers
+                }])
             return True
         except Exception as e:
             print(f"Ошибка сохранения ответов: {e}")
             return False
     
+    def save_responses(self, submissions, batch_size=1000):
+        """Сохраняет много заполненных анкет пакетами, каждый пакет - одна транзакция.
+        
+        Анкета - словарь с ключами survey_id, respondent (имя пользователя),
+        answers ({question_id: answer_text}) и необязательными started_at/completed_at.
+        Возвращает отчет о количестве сохраненных записей и скорости по пакетам.
+        """
+        report = {'responses': 0, 'answers': 0, 'seconds': 0.0, 'batches': []}
+        submissions = iter(submissions)
+        
+        try:
+            while True:
+                batch = list(itertools.islice(submissions, batch_size))
+                if not batch:
+                    break
+                
+                started = time.perf_counter()
+                with self.transaction() as conn:
+                    answer_count = self._insert_responses(conn.cursor(), batch)
+                elapsed = time.perf_counter() - started
+                
+                report['batches'].append({
+                    'responses': len(batch),
+                    'answers': answer_count,
+                    'seconds': elapsed,
+                    'responses_per_second': len(batch) / elapsed if elapsed else 0.0
+                })
+                report['responses'] += len(batch)
+                report['answers'] += answer_count
+                report['seconds'] += elapsed
+        except Exception as e:
+            print(f"Ошибка пакетного сохранения ответов: {e}")
+            report['error'] = str(e)
+        
+        report['responses_per_second'] = report['responses'] / report['seconds'] if report['seconds'] else 0.0
+        return report
+    
+    def _resolve_user_ids(self, c, usernames):
+        """Находит id пользователей по именам: из кэша учетных данных, остальных - запросом на каждые 500 имен"""
+        user_ids = {}
+        names = []
+        with self._identity_lock:
+            for name in {name for name in usernames if name}:
+                identity = self._identities.get(name)
+                if identity is not None:
+                    user_ids[name] = identity[0]
+                else:
+                    names.append(name)
+        
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            c.execute(f"SELECT username, id FROM users WHERE username IN ({placeholders})", chunk)
+            user_ids.update(c.fetchall())
+        return user_ids
+    
+    def _insert_responses(self, c, submissions):
+        """Вставляет анкеты и ответы на вопросы пакетно (внутри открытой транзакции)"""
+        user_ids = self._resolve_user_ids(c, [s.get('respondent') for s in submissions])
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        questions = load_question_types(
+            c, [question_id for s in submissions for question_id in s['answers']])
+        
+        # Транзакция держит блокировку записи, поэтому id анкет и ответов можно
+        # выделить заранее и связать их между собой без lastrowid на каждую строку
+        c.execute("SELECT COALESCE(MAX(id), 0) FROM responses")
+        next_response_id = c.fetchone()[0] + 1
+        c.execute("SELECT COALESCE(MAX(id), 0) FROM answers")
+        next_answer_id = c.fetchone()[0] + 1
+        
+        response_rows = []
+        answer_rows = []
+        option_rows = []
+        stats_rows = []
+        for offset, submission in enumerate(submissions):
+            response_id = next_response_id + offset
+            completed_at = submission.get('completed_at') or now
+            started_at = submission.get('started_at') or completed_at
+            response_rows.append((response_id, submission['survey_id'],
+                                  user_ids.get(submission.get('respondent')),
+                                  started_at, completed_at))
+            
+            for question_id, answer_text in submission['answers'].items():
+                answer_id = next_answer_id + len(answer_rows)
+                question_type, options = questions.get(question_id, (None, []))
+                
+                # Выбранные варианты множественного выбора храним индексами
+                if question_type == 'checkbox':
+                    answer_text, indexes = normalize_checkbox_answer(answer_text, options)
+                    option_rows.extend((answer_id, index) for index in indexes)
+                    stats_rows.append((question_id, answer_text, indexes))
+                else:
+                    stats_rows.append((question_id, answer_text))
+                
+                answer_rows.append((answer_id, response_id, question_id, answer_text))
+        
+        c.executemany("""INSERT INTO responses (id, survey_id, respondent_id, started_at, completed_at) 
+                       VALUES (?, ?, ?, ?, ?)""", response_rows)
+        c.executemany("""INSERT INTO answers (id, response_id, question_id, answer_text)
+                       VALUES (?, ?, ?, ?)""", answer_rows)
+        c.executemany("INSERT INTO answer_options (answer_id, option_index) VALUES (?, ?)", option_rows)
+        
+        # Статистика вопросов обновляется в той же транзакции, что и ответы
+        apply_question_stats(c, collect_question_stats(questions, stats_rows))
+        return len(answer_rows)
+    
     def get_survey_responses(self, survey_id):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        
-        # Получаем все ответы на опрос
-        c.execute("""
-            SELECT r.id as response_id, r.completed_at, u.username, 
-                   q.id as question_id, q.question_text, q.question_type, 
-                   a.answer_text
-            FROM responses r
-            JOIN users u ON r.respondent_id = u.id
-            JOIN answers a ON r.id = a.response_id
-            JOIN questions q ON a.question_id = q.id
-            WHERE r.survey_id = ?
-            ORDER BY r.id, q.position
-        """, (survey_id,))
-        
-        raw_data = c.fetchall()
-        conn.close()
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.row_factory = sqlite3.Row
+            
+            # Получаем все ответы на опрос
+            c.execute("""
+                SELECT r.id as response_id, r.completed_at, u.username,
+                       q.id as question_id, q.question_text, q.question_type,
+                       a.answer_text
+                FROM responses r
+                LEFT JOIN users u ON r.respondent_id = u.id
+                JOIN answers a ON r.id = a.response_id
+                JOIN questions q ON a.question_id = q.id
+                WHERE r.survey_id = ?
+                ORDER BY r.id, q.position
+            """, (survey_id,))
+            
+            raw_data = c.fetchall()
         
         # Структурируем данные по ответам
         responses = {}
@@ -292,18 +908,285 @@ class Database:
         
         return responses
     
-    def toggle_survey_status(self, survey_id):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
+    def get_responses_page(self, survey_id, after_id=0, limit=200):
+        """Страница анкет опроса с id больше after_id (постраничная выборка по ключу).
+        
+        Возвращает список (response_id, respondent, completed_at, {question_id: answer_text});
+        id последней анкеты страницы передается как after_id для следующей страницы.
+        """
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                SELECT r.id, u.username, r.completed_at
+                FROM responses r
+                LEFT JOIN users u ON r.respondent_id = u.id
+                WHERE r.survey_id = ? AND r.id > ?
+                ORDER BY r.id
+                LIMIT ?
+            """, (survey_id, after_id, limit))
+            page = [(response_id, username or '', completed_at, {})
+                    for response_id, username, completed_at in c.fetchall()]
+            
+            if page:
+                records = {record[0]: record[3] for record in page}
+                placeholders = ", ".join("?" * len(records))
+                c.execute(f"""
+                    SELECT response_id, question_id, answer_text FROM answers
+                    WHERE response_id IN ({placeholders})
+                """, list(records))
+                for response_id, question_id, answer_text in c.fetchall():
+                    records[response_id][question_id] = answer_text
+        
+        return page
+    
+    def get_response_activity(self, survey_id):
+        """Сводка по анкетам опроса: количество, респонденты, первая и последняя анкета, анкеты по дням"""
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                SELECT COUNT(*), COUNT(DISTINCT respondent_id), MIN(completed_at), MAX(completed_at)
+                FROM responses WHERE survey_id = ?
+            """, (survey_id,))
+            count, respondents, first_response, last_response = c.fetchone()
+            
+            c.execute("""
+                SELECT substr(completed_at, 1, 10) AS day, COUNT(*)
+                FROM responses WHERE survey_id = ?
+                GROUP BY day ORDER BY day
+            """, (survey_id,))
+            per_day = c.fetchall()
+        
+        return {
+            'count': count,
+            'respondents': respondents,
+            'first_response': first_response,
+            'last_response': last_response,
+            'per_day': per_day
+        }
+    
+    def get_question_stats(self, survey_id):
+        """Готовая статистика по вопросам опроса из таблицы question_stats.
+        
+        Для каждого вопроса: count, mean, std, min, max и distribution -
+        {вариант ответа / числовое значение / длина текста: количество}.
+        """
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                SELECT s.question_id, q.question_type, s.bucket, s.count, s.total,
+                       s.total_sq, s.min_value, s.max_value
+                FROM question_stats s
+                JOIN questions q ON s.question_id = q.id
+                WHERE q.survey_id = ?
+            """, (survey_id,))
+            rows = c.fetchall()
         
-        # Получаем текущий статус опроса
-        c.execute("SELECT is_active FROM surveys WHERE id = ?", (survey_id,))
-        current_status = c.fetchone()[0]
+        stats = {}
+        for question_id, question_type, bucket, count, total, total_sq, min_value, max_value in rows:
+            q_stats = stats.setdefault(question_id, {
+                'count': 0, 'mean': None, 'std': None, 'min': None, 'max': None,
+                'distribution': {}
+            })
+            
+            if bucket == '':
+                q_stats['count'] = count
+                # total бывает NULL в статистике, накопленной до пропуска нечисловых значений
+                if min_value is not None and total is not None and total_sq is not None and count:
+                    mean = total / count
+                    q_stats['mean'] = mean
+                    q_stats['std'] = max(total_sq / count - mean * mean, 0.0) ** 0.5
+                    q_stats['min'] = min_value
+                    q_stats['max'] = max_value
+            elif question_type in CHOICE_TYPES:
+                q_stats['distribution'][bucket] = count
+            elif question_type == 'number':
+                q_stats['distribution'][float(bucket)] = count
+            else:
+                q_stats['distribution'][int(bucket)] = count
+        
+        return stats
+    
+    def get_option_counts(self, question_id):
+        """Частоты вариантов ответа на вопрос с множественным выбором: {вариант: количество}"""
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT options FROM questions WHERE id = ?", (question_id,))
+            row = c.fetchone()
+            options = json.loads(row[0]) if row and row[0] else []
+            
+            c.execute("""
+                SELECT o.option_index, COUNT(*)
+                FROM answers a
+                JOIN answer_options o ON o.answer_id = a.id
+                WHERE a.question_id = ?
+                GROUP BY o.option_index
+            """, (question_id,))
+            rows = c.fetchall()
         
-        # Изменяем статус на противоположный
-        new_status = 1 if current_status == 0 else 0
-        c.execute("UPDATE surveys SET is_active = ? WHERE id = ?", (new_status, survey_id))
+        return {options[index]: count for index, count in rows if index < len(options)}
+    
+    def get_response_dates(self, survey_id):
+        """Анкеты опроса в порядке id: [(response_id, completed_at), ...]"""
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT id, completed_at FROM responses WHERE survey_id = ? ORDER BY id", (survey_id,))
+            rows = c.fetchall()
+        return rows
+    
+    def get_question_answers(self, question_id):
+        """Ответы на вопрос: [(response_id, answer_text), ...]"""
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT response_id, answer_text FROM answers WHERE question_id = ?", (question_id,))
+            rows = c.fetchall()
+        return rows
+    
+    def get_question_option_answers(self, question_id):
+        """Выбранные варианты вопроса с множественным выбором: [(response_id, option_index), ...]"""
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                SELECT a.response_id, o.option_index
+                FROM answers a
+                JOIN answer_options o ON o.answer_id = a.id
+                WHERE a.question_id = ?
+            """, (question_id,))
+            rows = c.fetchall()
+        return rows
+    
+    def search_answers(self, survey_id, search, question_id=None, before_id=None, limit=100):
+        """Ищет слова в ответах на текстовые вопросы опроса, от новых ответов к старым.
         
-        conn.commit()
-        conn.close()
+        Возвращает строки (answer_id, response_id, respondent, completed_at, question_id, snippet),
+        где snippet - фрагмент ответа с найденными словами в [квадратных скобках].
+        before_id - answer_id последней строки предыдущей страницы.
+        """
+        conditions = ["q.survey_id = ?", "q.question_type IN ('text', 'textarea')"]
+        params = [survey_id]
+        if question_id is not None:
+            conditions.append("a.question_id = ?")
+            params.append(question_id)
+        
+        fts_query = make_fts_query(search) if self.has_fts_table('answers_fts') else ''
+        if fts_query:
+            # Совпадения перебираются по FTS-индексу, остальное достается по ключам.
+            # NOT INDEXED: иначе планировщик сканирует покрывающий idx_answers_response
+            # вместо поиска ответа по первичному ключу
+            source = "answers_fts f CROSS JOIN answers a NOT INDEXED ON a.id = f.rowid"
+            key = "f.rowid"
+            snippet = "snippet(answers_fts, 0, '[', ']', '...', 12)"
+            conditions.insert(0, "answers_fts MATCH ?")
+            params.insert(0, fts_query)
+        elif (search or '').strip():
+            source = "answers a"
+            key = "a.id"
+            snippet = "substr(a.answer_text, 1, 100)"
+            conditions.append("a.answer_text LIKE ?")
+            params.append(f"%{search.strip()}%")
+        else:
+            return []
+        
+        if before_id is not None:
+            conditions.append(f"{key} < ?")
+            params.append(before_id)
+        
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute(f"""
+                SELECT a.id, a.response_id, u.username, r.completed_at, a.question_id, {snippet}
+                FROM {source}
+                JOIN questions q ON q.id = a.question_id
+                JOIN responses r ON r.id = a.response_id
+                LEFT JOIN users u ON u.id = r.respondent_id
+                WHERE {' AND '.join(conditions)}
+                ORDER BY {key} DESC
+                LIMIT ?
+            """, params + [limit])
+            rows = c.fetchall()
+        return rows
+    
+    def count_survey_responses(self, survey_id):
+        """Количество заполненных анкет опроса"""
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT COUNT(*) FROM responses WHERE survey_id = ?", (survey_id,))
+            count = c.fetchone()[0]
+        return count
+    
+    def get_survey_data_version(self, survey_id):
+        """Версия данных опроса (число анкет, последний id анкеты) - меняется с каждой новой анкетой"""
+        with self.connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT COUNT(*), MAX(id) FROM responses WHERE survey_id = ?", (survey_id,))
+            version = c.fetchone()
+        return version
+    
+    def iter_survey_answers(self, survey_id, chunk_size=1000, with_options=False):
+        """Построчно отдает ответы опроса курсором, не загружая их в память целиком.
+        
+        Строки (response_id, username, completed_at, question_id, answer_text) идут
+        по анкетам подряд, в порядке завершения; анкета без ответов дает одну
+        строку с question_id = None. С with_options в конце строки добавляется
+        список индексов выбранных вариантов из answer_options.
+        """
+        options_column = ""
+        if with_options:
+            options_column = """, (SELECT group_concat(o.option_index)
+                                   FROM answer_options o WHERE o.answer_id = a.id)"""
+        
+        with self.connection() as conn:
+            c = conn.cursor()
+            # Порядок (completed_at, id) совпадает с индексом idx_responses_survey,
+            # поэтому SQLite не сортирует всю выборку
+            c.execute(f"""
+                SELECT r.id, u.username, r.completed_at, a.question_id, a.answer_text{options_column}
+                FROM responses r
+                LEFT JOIN users u ON r.respondent_id = u.id
+                LEFT JOIN answers a ON a.response_id = r.id
+                WHERE r.survey_id = ?
+                ORDER BY r.completed_at, r.id
+            """, (survey_id,))
+            
+            while True:
+                rows = c.fetchmany(chunk_size)
+                if not rows:
+                    break
+                if with_options:
+                    for row in rows:
+                        indexes = [int(index) for index in row[5].split(',')] if row[5] else []
+                        yield row[:5] + (indexes,)
+                else:
+                    yield from rows
+    
+    def toggle_survey_status(self, survey_id):
+        with self.transaction() as conn:
+            c = conn.cursor()
+            
+            # Получаем текущий статус опроса
+            c.execute("SELECT is_active FROM surveys WHERE id = ?", (survey_id,))
+            current_status = c.fetchone()[0]
+            
+            # Изменяем статус на противоположный
+            new_status = 1 if current_status == 0 else 0
+            c.execute("UPDATE surveys SET is_active = ? WHERE id = ?", (new_status, survey_id))
+        
+        self.survey_cache.invalidate(survey_id)
         return new_status
+
+# Замер всех публичных методов Database, кроме служебных
+instrument_methods(Database, exclude=('connection', 'transaction', 'close',
+                                      'get_query_stats', 'reset_query_stats'))
+
+# Общие для процесса экземпляры Database, по одному на файл БД
+_shared_databases = {}
+_shared_lock = threading.Lock()
+
+def get_database(db_name="app_database.db"):
+    """Возвращает общий экземпляр Database для файла БД, создавая его при первом обращении"""
+    db_path = Database.resolve_path(db_name)
+    with _shared_lock:
+        db = _shared_databases.get(db_path)
+        if db is None:
+            db = Database(db_path)
+            _shared_databases[db_path] = db
+    return db
\ No newline at end of file
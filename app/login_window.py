@@ -1,16 +1,16 @@
 from tkinter import *
 from tkinter import ttk
 from tkinter import messagebox
-from database import Database
+from database import get_database
 from styles import AppTheme
 
 class LoginWindow:
-    def __init__(self, master=None, callback=None):
+    def __init__(self, master=None, callback=None, db=None):
         self.master = master if master else Tk()
         self.master.title("Вход в систему")
         self.master.geometry("400x500")
         self.master.configure(bg="#ecf0f1")  # Светло-серый фон
-        self.db = Database()
+        self.db = db if db else get_database()
         self.callback = callback
         
         # Применяем темы и стили
@@ -0,0 +1,195 @@
+import sqlite3
+
+# Версионные миграции схемы БД.
+# Текущая версия схемы хранится в PRAGMA user_version, каждая миграция
+# применяется в отдельной транзакции и переводит БД на следующую версию.
+# Шаг миграции - SQL-строка или функция, принимающая курсор.
+
+def _create_base_tables(c):
+    # Таблица пользователей
+    c.execute('''CREATE TABLE IF NOT EXISTS users
+                 (id INTEGER PRIMARY KEY, username TEXT UNIQUE,
+                  password TEXT, is_admin INTEGER, created_at TEXT)''')
+    
+    # Таблица опросов
+    c.execute('''CREATE TABLE IF NOT EXISTS surveys
+                 (id INTEGER PRIMARY KEY, title TEXT, description TEXT,
+                  creator_id INTEGER, created_at TEXT,
+                  is_active INTEGER DEFAULT 1,
+                  FOREIGN KEY (creator_id) REFERENCES users (id))''')
+    
+    # Таблица вопросов
+    c.execute('''CREATE TABLE IF NOT EXISTS questions
+                 (id INTEGER PRIMARY KEY, survey_id INTEGER,
+                  question_text TEXT, question_type TEXT,
+                  required INTEGER DEFAULT 1, options TEXT,
+                  position INTEGER,
+                  FOREIGN KEY (survey_id) REFERENCES surveys (id))''')
+    
+    # Таблица ответов
+    c.execute('''CREATE TABLE IF NOT EXISTS responses
+                 (id INTEGER PRIMARY KEY, survey_id INTEGER,
+                  respondent_id INTEGER, started_at TEXT,
+                  completed_at TEXT,
+                  FOREIGN KEY (survey_id) REFERENCES surveys (id),
+                  FOREIGN KEY (respondent_id) REFERENCES users (id))''')
+    
+    # Таблица ответов на вопросы
+    c.execute('''CREATE TABLE IF NOT EXISTS answers
+                 (id INTEGER PRIMARY KEY, response_id INTEGER,
+                  question_id INTEGER, answer_text TEXT,
+                  FOREIGN KEY (response_id) REFERENCES responses (id),
+                  FOREIGN KEY (question_id) REFERENCES questions (id))''')
+
+def _rebuild_question_stats(c):
+    # Импорт здесь, так как database сам импортирует этот модуль
+    from database import rebuild_question_stats
+    rebuild_question_stats(c)
+
+def _fill_answer_options(c):
+    # Раскладываем сохраненные строки "вариант 1, вариант 2" на индексы вариантов
+    from database import load_question_types, split_checkbox_answer
+    questions = load_question_types(c)
+    checkbox_ids = [question_id for question_id, (question_type, _) in questions.items()
+                    if question_type == 'checkbox']
+    
+    for question_id in checkbox_ids:
+        options = questions[question_id][1]
+        c.execute("SELECT id, answer_text FROM answers WHERE question_id = ?", (question_id,))
+        rows = [(answer_id, index)
+                for answer_id, answer_text in c.fetchall()
+                for index in split_checkbox_answer(answer_text, options)]
+        c.executemany("INSERT OR IGNORE INTO answer_options (answer_id, option_index) VALUES (?, ?)", rows)
+
+def _create_surveys_search(c):
+    # Полнотекстовый индекс по названию и описанию опросов.
+    # FTS5 есть не во всех сборках SQLite - без него поиск работает через LIKE
+    try:
+        c.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS surveys_fts USING fts5
+                     (title, description, content='surveys', content_rowid='id')""")
+    except sqlite3.OperationalError as e:
+        print(f"Полнотекстовый поиск опросов недоступен: {e}")
+        return
+    
+    # Индекс поддерживается триггерами при любом изменении опросов
+    c.execute("""CREATE TRIGGER IF NOT EXISTS surveys_fts_insert AFTER INSERT ON surveys BEGIN
+                     INSERT INTO surveys_fts (rowid, title, description)
+                     VALUES (new.id, new.title, new.description);
+                 END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS surveys_fts_delete AFTER DELETE ON surveys BEGIN
+                     INSERT INTO surveys_fts (surveys_fts, rowid, title, description)
+                     VALUES ('delete', old.id, old.title, old.description);
+                 END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS surveys_fts_update AFTER UPDATE OF title, description ON surveys BEGIN
+                     INSERT INTO surveys_fts (surveys_fts, rowid, title, description)
+                     VALUES ('delete', old.id, old.title, old.description);
+                     INSERT INTO surveys_fts (rowid, title, description)
+                     VALUES (new.id, new.title, new.description);
+                 END""")
+    c.execute("INSERT INTO surveys_fts (surveys_fts) VALUES ('rebuild')")
+
+def _create_answers_search(c):
+    # Полнотекстовый индекс по ответам на текстовые вопросы.
+    # Текст хранится только в answers, в индекс попадают лишь ответы
+    # на вопросы типов text/textarea - это проверяют условия триггеров
+    try:
+        c.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS answers_fts USING fts5
+                     (answer_text, content='answers', content_rowid='id')""")
+    except sqlite3.OperationalError as e:
+        print(f"Полнотекстовый поиск по ответам недоступен: {e}")
+        return
+    
+    is_text = """(SELECT question_type FROM questions WHERE id = {row}.question_id) IN ('text', 'textarea')"""
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS answers_fts_insert AFTER INSERT ON answers
+                  WHEN {is_text.format(row='new')} BEGIN
+                      INSERT INTO answers_fts (rowid, answer_text) VALUES (new.id, new.answer_text);
+                  END""")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS answers_fts_delete AFTER DELETE ON answers
+                  WHEN {is_text.format(row='old')} BEGIN
+                      INSERT INTO answers_fts (answers_fts, rowid, answer_text)
+                      VALUES ('delete', old.id, old.answer_text);
+                  END""")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS answers_fts_update AFTER UPDATE OF answer_text ON answers
+                  WHEN {is_text.format(row='new')} BEGIN
+                      INSERT INTO answers_fts (answers_fts, rowid, answer_text)
+                      VALUES ('delete', old.id, old.answer_text);
+                      INSERT INTO answers_fts (rowid, answer_text) VALUES (new.id, new.answer_text);
+                  END""")
+    
+    # Уже сохраненные ответы на текстовые вопросы
+    c.execute("""INSERT INTO answers_fts (rowid, answer_text)
+                 SELECT a.id, a.answer_text FROM answers a
+                 JOIN questions q ON q.id = a.question_id
+                 WHERE q.question_type IN ('text', 'textarea')""")
+
+# Список миграций: (версия, описание, шаги)
+MIGRATIONS = [
+    (1, "Базовые таблицы", [
+        _create_base_tables,
+    ]),
+    (2, "Индексы для выборок по опросам, вопросам и ответам", [
+        "CREATE INDEX IF NOT EXISTS idx_questions_survey ON questions (survey_id, position)",
+        "CREATE INDEX IF NOT EXISTS idx_answers_response ON answers (response_id, question_id)",
+        "CREATE INDEX IF NOT EXISTS idx_responses_survey ON responses (survey_id)",
+        "CREATE INDEX IF NOT EXISTS idx_surveys_creator ON surveys (creator_id, is_active)",
+    ]),
+    (3, "Покрывающий индекс для подсчета ответов по опросам", [
+        "DROP INDEX IF EXISTS idx_responses_survey",
+        "CREATE INDEX IF NOT EXISTS idx_responses_survey ON responses (survey_id, completed_at)",
+    ]),
+    (4, "Предрасчитанная статистика по вопросам", [
+        """CREATE TABLE IF NOT EXISTS question_stats
+           (question_id INTEGER, bucket TEXT,
+            count INTEGER DEFAULT 0, total REAL DEFAULT 0, total_sq REAL DEFAULT 0,
+            min_value REAL, max_value REAL,
+            PRIMARY KEY (question_id, bucket),
+            FOREIGN KEY (question_id) REFERENCES questions (id)) WITHOUT ROWID""",
+        _rebuild_question_stats,
+    ]),
+    (5, "Выбранные варианты множественного выбора в отдельной таблице", [
+        """CREATE TABLE IF NOT EXISTS answer_options
+           (answer_id INTEGER, option_index INTEGER,
+            PRIMARY KEY (answer_id, option_index),
+            FOREIGN KEY (answer_id) REFERENCES answers (id)) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS idx_answers_question ON answers (question_id)",
+        _fill_answer_options,
+    ]),
+    (6, "Индекс для постраничного просмотра анкет опроса по id", [
+        "CREATE INDEX IF NOT EXISTS idx_responses_survey_id ON responses (survey_id, id)",
+    ]),
+    (7, "Постраничный каталог опросов и полнотекстовый поиск по ним", [
+        "CREATE INDEX IF NOT EXISTS idx_surveys_active ON surveys (is_active, id)",
+        _create_surveys_search,
+    ]),
+    (8, "Полнотекстовый поиск по ответам на текстовые вопросы", [
+        _create_answers_search,
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    """Возвращает текущую версию схемы БД"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(db):
+    """Применяет к БД недостающие миграции, возвращает список примененных версий"""
+    applied = []
+    for version, description, steps in MIGRATIONS:
+        with db.transaction() as conn:
+            # Версию перечитываем под блокировкой записи, чтобы параллельно
+            # запущенные экземпляры приложения не применили миграцию дважды
+            if get_schema_version(conn) >= version:
+                continue
+            
+            c = conn.cursor()
+            for step in steps:
+                if callable(step):
+                    step(c)
+                else:
+                    c.execute(step)
+            
+            c.execute(f"PRAGMA user_version = {version}")
+            applied.append(version)
+    
+    return applied
@@ -0,0 +1,289 @@
+import time
+import sqlite3
+import inspect
+import threading
+import functools
+from collections import deque
+
+# Инструментирование запросов к БД.
+# Каждый публичный метод Database оборачивается замером: число вызовов, время
+# (суммарное и перцентили по последним вызовам) и число прочитанных строк.
+# Соединения пула создаются с InstrumentedConnection, курсоры которого считают
+# строки и запоминают выполненные запросы. Если вызов метода дольше порога,
+# он попадает в журнал медленных запросов вместе с EXPLAIN QUERY PLAN самых
+# долгих запросов. Параметры запросов в журнал не попадают (там бывают пароли).
+
+# Порог медленного вызова по умолчанию, с
+SLOW_QUERY_THRESHOLD = 0.2
+
+# Сколько последних замеров метода хранится для перцентилей
+LATENCY_WINDOW = 1024
+
+# Сколько медленных вызовов помнит журнал
+SLOW_LOG_SIZE = 50
+
+# Сколько запросов одного вызова запоминается для журнала и сколько из них объясняется
+MAX_STATEMENTS = 200
+EXPLAINED_STATEMENTS = 3
+
+# Запросы через db.connection() из других модулей, выполненные не из методов Database
+OUTSIDE_METHODS = "(вне методов Database)"
+
+_context = threading.local()
+
+def _call_stack():
+    stack = getattr(_context, 'stack', None)
+    if stack is None:
+        stack = _context.stack = []
+    return stack
+
+def percentile(sorted_values, fraction):
+    """Перцентиль по отсортированному списку (ближайший ранг)"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+class _MethodCall:
+    """Один вызов метода Database: прочитанные строки и выполненные запросы"""
+    
+    __slots__ = ('name', 'rows', 'statements')
+    
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.statements = []
+
+class QueryStats:
+    """Статистика вызовов методов Database и журнал медленных запросов"""
+    
+    def __init__(self, slow_threshold=SLOW_QUERY_THRESHOLD, explain=None):
+        self.slow_threshold = slow_threshold
+        # explain(sql, params) -> строки плана запроса
+        self.explain = explain
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """Обнуляет статистику и журнал"""
+        with self._lock:
+            self._methods = {}
+            self._slow = deque(maxlen=SLOW_LOG_SIZE)
+            self.since = time.strftime("%Y-%m-%d %H:%M:%S")
+    
+    def record(self, method, seconds, rows=0, calls=1):
+        """Учитывает вызов метода (calls=0 - только добавить время и строки)"""
+        with self._lock:
+            entry = self._methods.get(method)
+            if entry is None:
+                entry = self._methods[method] = {'calls': 0, 'seconds': 0.0, 'rows': 0, 'max': 0.0,
+                                                 'latencies': deque(maxlen=LATENCY_WINDOW)}
+            entry['calls'] += calls
+            entry['seconds'] += seconds
+            entry['rows'] += rows
+            if calls:
+                entry['latencies'].append(seconds)
+                entry['max'] = max(entry['max'], seconds)
+    
+    def record_slow(self, call, seconds):
+        """Записывает медленный вызов в журнал с планами самых долгих запросов"""
+        statements = sorted(call.statements, key=lambda statement: -statement[2])
+        logged = []
+        for index, (sql, params, seconds_spent, rows, many) in enumerate(statements):
+            plan = None
+            explainable = not many and sql.lstrip()[:6].upper() in ('SELECT', 'WITH')
+            if index < EXPLAINED_STATEMENTS and self.explain and explainable:
+                try:
+                    plan = self.explain(sql, params)
+                except Exception as e:
+                    plan = [f"Ошибка EXPLAIN: {e}"]
+            logged.append({'sql': " ".join(sql.split()), 'ms': 1000 * seconds_spent,
+                           'rows': rows, 'plan': plan})
+        
+        print(f"Медленный вызов {call.name}: {1000 * seconds:.0f} мс, запросов: {len(call.statements)}")
+        with self._lock:
+            self._slow.append({'at': time.strftime("%Y-%m-%d %H:%M:%S"), 'method': call.name,
+                               'ms': 1000 * seconds, 'rows': call.rows, 'statements': logged})
+    
+    def snapshot(self):
+        """Снимок статистики: методы (от самых затратных) и журнал медленных вызовов"""
+        with self._lock:
+            methods = [(name, dict(entry, latencies=sorted(entry['latencies'])))
+                       for name, entry in self._methods.items()]
+            slow = list(self._slow)
+            since = self.since
+        
+        result = {}
+        for name, entry in sorted(methods, key=lambda item: -item[1]['seconds']):
+            latencies = entry['latencies']
+            result[name] = {
+                'calls': entry['calls'],
+                'total_ms': 1000 * entry['seconds'],
+                'mean_ms': 1000 * entry['seconds'] / entry['calls'] if entry['calls'] else 0.0,
+                'p50_ms': 1000 * percentile(latencies, 0.50),
+                'p95_ms': 1000 * percentile(latencies, 0.95),
+                'p99_ms': 1000 * percentile(latencies, 0.99),
+                'max_ms': 1000 * entry['max'],
+                'rows': entry['rows'],
+            }
+        return {'since': since, 'slow_threshold_ms': 1000 * self.slow_threshold,
+                'methods': result, 'slow_queries': slow}
+
+def _statement_executed(connection, sql, parameters, seconds, many):
+    """Учитывает выполненный запрос; возвращает запись запроса для подсчета строк.
+    
+    Запись - список [sql, параметры, время, строки, executemany]; разбирается
+    только при записи в журнал, чтобы не замедлять быстрые запросы.
+    """
+    statement = [sql, parameters, seconds, 0, many]
+    
+    stack = getattr(_context, 'stack', None)
+    if stack:
+        # Запросы копятся у внешнего вызова - журнал пишется для него
+        statements = stack[0].statements
+        if len(statements) < MAX_STATEMENTS:
+            statements.append(statement)
+    else:
+        stats = getattr(connection, 'query_stats', None)
+        if stats is not None:
+            stats.record(OUTSIDE_METHODS, seconds)
+    return statement
+
+def _rows_fetched(cursor, rows, seconds):
+    statement = cursor._statement
+    if statement is not None:
+        statement[2] += seconds
+        statement[3] += rows
+    
+    stack = getattr(_context, 'stack', None)
+    if stack:
+        for call in stack:
+            call.rows += rows
+    else:
+        stats = getattr(cursor.connection, 'query_stats', None)
+        if stats is not None:
+            stats.record(OUTSIDE_METHODS, seconds, rows, calls=0)
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Курсор, который замеряет запросы и считает прочитанные строки"""
+    
+    _statement = None
+    
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._statement = _statement_executed(self.connection, sql, parameters,
+                                                  time.perf_counter() - started, False)
+    
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._statement = _statement_executed(self.connection, sql, None,
+                                                  time.perf_counter() - started, True)
+    
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        _rows_fetched(self, 0 if row is None else 1, time.perf_counter() - started)
+        return row
+    
+    def fetchmany(self, *args, **kwargs):
+        started = time.perf_counter()
+        rows = super().fetchmany(*args, **kwargs)
+        _rows_fetched(self, len(rows), time.perf_counter() - started)
+        return rows
+    
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        _rows_fetched(self, len(rows), time.perf_counter() - started)
+        return rows
+    
+    def __next__(self):
+        started = time.perf_counter()
+        row = super().__next__()
+        _rows_fetched(self, 1, time.perf_counter() - started)
+        return row
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Соединение, все запросы которого идут через InstrumentedCursor"""
+    
+    # Статистика Database, которому принадлежит соединение (задает пул)
+    query_stats = None
+    
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def _finish_call(stats, call, seconds, outermost):
+    stats.record(call.name, seconds, call.rows)
+    if outermost and seconds >= stats.slow_threshold:
+        stats.record_slow(call, seconds)
+
+def instrument_method(name, method):
+    """Оборачивает метод Database замером времени, строк и запросов"""
+    if inspect.isgeneratorfunction(method):
+        # Время генератора - только время внутри него, без обработки строк вызывающим
+        @functools.wraps(method)
+        def generator_wrapper(self, *args, **kwargs):
+            stats = getattr(self, 'query_stats', None)
+            if stats is None:
+                yield from method(self, *args, **kwargs)
+                return
+            
+            call = _MethodCall(name)
+            stack = _call_stack()
+            outermost = not stack
+            iterator = method(self, *args, **kwargs)
+            seconds = 0.0
+            try:
+                while True:
+                    stack.append(call)
+                    started = time.perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        seconds += time.perf_counter() - started
+                        stack.pop()
+                    yield item
+            finally:
+                iterator.close()
+                _finish_call(stats, call, seconds, outermost)
+        return generator_wrapper
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        stats = getattr(self, 'query_stats', None)
+        if stats is None:
+            return method(self, *args, **kwargs)
+        
+        call = _MethodCall(name)
+        stack = _call_stack()
+        stack.append(call)
+        started = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - started
+            stack.pop()
+            _finish_call(stats, call, seconds, not stack)
+    return wrapper
+
+def instrument_methods(cls, exclude=()):
+    """Оборачивает все публичные методы класса, кроме перечисленных в exclude"""
+    for name, value in list(vars(cls).items()):
+        if name.startswith('_') or name in exclude or not inspect.isfunction(value):
+            continue
+        setattr(cls, name, instrument_method(name, value))
+    return cls
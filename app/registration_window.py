@@ -1,14 +1,14 @@
 from tkinter import *
 from tkinter import ttk
 from tkinter import messagebox
-from database import Database
+from database import get_database
 
 class RegistrationWindow:
     def __init__(self, master=None, db=None):
         self.master = master if master else Tk()
         self.master.title("Регистрация")
         self.master.geometry("400x300")
-        self.db = db if db else Database()
+        self.db = db if db else get_database()
         self.create_widgets()
 
     def create_widgets(self):
@@ -0,0 +1,163 @@
+import os
+import sys
+import json
+import time
+import builtins
+import platform
+import threading
+import functools
+
+# Профилирование запуска приложения.
+# Включается флагом --profile [файл] или переменной окружения SURVEYS_PROFILE=файл
+# (значение 1 - файл по умолчанию). Записывает время импорта модулей, время до
+# отрисовки главного окна и время построения представлений; отчет в JSON
+# сохраняется при выходе из приложения, чтобы сравнивать запуск разных версий.
+
+DEFAULT_REPORT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "startup_profile.json")
+
+# Методы, время работы которых попадает в отчет: (модуль, класс, метод)
+PROFILED_METHODS = [
+    ('styles', 'AppTheme', 'initialize_styles'),
+    ('window_core', 'Application', 'create_window'),
+    ('window_core', 'Application', 'create_menu'),
+    ('window_core', 'Application', 'create_main_layout'),
+    ('window_core', 'Application', 'on_first_window'),
+    ('window_core', 'Application', 'show_welcome_screen'),
+    ('window_core', 'Application', 'show_available_surveys'),
+    ('window_core', 'Application', 'display_available_surveys'),
+    ('window_core', 'Application', 'show_my_surveys'),
+    ('window_core', 'Application', 'display_my_surveys'),
+]
+
+def get_profile_path(argv, environ):
+    """Путь к отчету профилирования из аргументов или окружения, None - профилирование выключено"""
+    if "--profile" in argv:
+        index = argv.index("--profile")
+        if index + 1 < len(argv) and not argv[index + 1].startswith("-"):
+            return os.path.abspath(argv[index + 1])
+        return DEFAULT_REPORT
+    
+    value = environ.get("SURVEYS_PROFILE", "")
+    if value in ("", "0"):
+        return None
+    return DEFAULT_REPORT if value == "1" else os.path.abspath(value)
+
+class StartupProfiler:
+    """Собирает время импортов, отметки запуска и время вызовов методов"""
+    
+    def __init__(self, started_at, report_path=DEFAULT_REPORT):
+        self.started_at = started_at
+        self.report_path = report_path
+        self.imports = []
+        self.marks = {}
+        self.calls = {}
+        self.app = None
+        
+        self._original_import = None
+        self._depth = 0
+        self._main_thread = threading.main_thread()
+    
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+    
+    def mark(self, name):
+        """Отметка времени от запуска"""
+        self.marks[name] = self.elapsed()
+    
+    def install_import_hook(self):
+        """Начинает замер импортов модулей в главном потоке"""
+        if self._original_import is not None:
+            return
+        original = self._original_import = builtins.__import__
+        
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            # Уже загруженные модули, относительные импорты и фоновые потоки не замеряем
+            if level or name in sys.modules or threading.current_thread() is not self._main_thread:
+                return original(name, globals, locals, fromlist, level)
+            
+            started = time.perf_counter()
+            entry = {'module': name, 'depth': self._depth, 'at': started - self.started_at}
+            self.imports.append(entry)
+            self._depth += 1
+            try:
+                return original(name, globals, locals, fromlist, level)
+            finally:
+                self._depth -= 1
+                entry['seconds'] = time.perf_counter() - started
+        
+        builtins.__import__ = timed_import
+    
+    def remove_import_hook(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+    
+    def instrument(self, methods=PROFILED_METHODS):
+        """Подменяет методы классов обертками, замеряющими время вызова"""
+        for module_name, class_name, method_name in methods:
+            cls = getattr(sys.modules[module_name], class_name)
+            label = f"{class_name}.{method_name}"
+            setattr(cls, method_name, self._timed(label, getattr(cls, method_name)))
+    
+    def _timed(self, label, method):
+        calls = self.calls.setdefault(label, [])
+        
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                calls.append(time.perf_counter() - started)
+        return wrapper
+    
+    def report(self):
+        """Отчет профилирования в виде словаря"""
+        calls = {}
+        for label, durations in self.calls.items():
+            if durations:
+                calls[label] = {
+                    'count': len(durations),
+                    'total_seconds': sum(durations),
+                    'first_seconds': durations[0],
+                    'max_seconds': max(durations),
+                }
+        
+        top_level = [entry for entry in self.imports if entry['depth'] == 0 and 'seconds' in entry]
+        first_window = getattr(self.app, 'first_window_time', None)
+        return {
+            'created_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'total_seconds': self.elapsed(),
+            'first_window_seconds': first_window,
+            'first_window_target': getattr(self.app, 'FIRST_WINDOW_TARGET', None),
+            'marks': self.marks,
+            'import_seconds': sum(entry['seconds'] for entry in top_level
+                                  if entry['at'] < self.marks.get('imports_done', float('inf'))),
+            'slowest_imports': sorted(top_level, key=lambda entry: -entry['seconds'])[:15],
+            'imports': self.imports,
+            'calls': calls,
+        }
+    
+    def write(self):
+        """Сохраняет отчет в JSON"""
+        try:
+            directory = os.path.dirname(self.report_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.report_path, 'w', encoding='utf-8') as f:
+                json.dump(self.report(), f, ensure_ascii=False, indent=2)
+            print(f"Отчет профилирования запуска сохранен: {self.report_path}")
+        except OSError as e:
+            print(f"Ошибка сохранения отчета профилирования: {e}")
+
+def start_profiling(argv, started_at, environ=os.environ):
+    """Включает профилирование, если оно запрошено; возвращает StartupProfiler или None"""
+    report_path = get_profile_path(argv, environ)
+    if report_path is None:
+        return None
+    
+    profiler = StartupProfiler(started_at, report_path)
+    profiler.install_import_hook()
+    return profiler
@@ -1,7 +1,6 @@
 from tkinter import ttk, font
 from tkinter import *
 import os
-from PIL import Image, ImageTk
 
 class AppTheme:
     def __init__(self, root):
@@ -176,6 +175,9 @@ class AppTheme:
             if not os.path.exists(path):
                 return None
                 
+            # PIL нужен только для картинок, поэтому не загружается при старте приложения
+            from PIL import Image, ImageTk
+            
             img = Image.open(path)
             img = img.resize((width, height), Image.LANCZOS)
             return ImageTk.PhotoImage(img)
@@ -1,61 +1,93 @@
 from tkinter import *
 from tkinter import ttk
 from tkinter import messagebox
-from database import Database
+from database import get_database
 from styles import AppTheme
-import matplotlib.pyplot as plt
+from analytics_engine import get_dataset, question_kind
+from chart_cache import get_chart_cache
+from async_loader import AsyncLoader
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
-from collections import Counter
-import datetime
+import base64
 
 class SurveyAnalytics:
+    # Сколько анкет подгружать в таблицу сырых данных за один раз
+    RAW_PAGE_SIZE = 200
+    
+    # Размер графиков (дюймы) по виду вопроса и сколько графиков держать нарисованными
+    CHART_SIZES = {'choice': (8, 4), 'multi_choice': (8, 4), 'number': (8, 3), 'text': (8, 3)}
+    CHART_DPI = 100
+    MAX_RENDERED_CHARTS = 8
+    
     def __init__(self, master=None, db=None, survey_id=None):
         self.master = master if master else Toplevel()
         self.master.title("Анализ результатов опроса")
         self.master.geometry("1000x800")
-        self.db = db if db else Database()
+        self.db = db if db else get_database()
         self.survey_id = survey_id
+        self.chart_cache = get_chart_cache(self.db)
         
         # Данные
         self.survey = None
         self.questions = []
-        self.responses = {}
+        self.activity = None
+        self.chart_slots = []
+        self.rendered_charts = []
         
         # Применяем темы и стили
         self.theme = AppTheme(self.master)
         
-        # Загружаем данные
-        self.load_data()
+        # Данные загружаются в фоне, задачи отменяются при закрытии окна
+        self.loader = AsyncLoader(self.master)
         
-        # Создаем интерфейс
-        self.create_widgets()
+        # Загружаем данные, интерфейс создается по их готовности
+        self.load_data()
     
     def load_data(self):
-        """Загружает данные опроса и ответы"""
+        """Запускает фоновую загрузку данных опроса, пока показывается заглушка"""
+        self.loading_label = Label(self.master, text="Загрузка данных опроса...",
+                                  font=self.theme.fonts['subtitle'],
+                                  bg=self.theme.colors['background'],
+                                  fg=self.theme.colors['text_secondary'])
+        self.loading_label.pack(expand=True)
+        
+        self.loader.submit(self.fetch_data, self.on_data_loaded, self.on_load_error)
+    
+    def fetch_data(self):
+        """Читает опрос, вопросы и сводку по анкетам (выполняется в фоновом потоке)"""
         # Получаем информацию об опросе
-        conn = self.db.db_path
-        import sqlite3
-        conn = sqlite3.connect(conn)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
+        survey_data = self.db.get_survey(self.survey_id)
+        if not survey_data:
+            return None
+        
+        # Получаем вопросы опроса
+        questions = self.db.get_questions(self.survey_id)
         
-        c.execute("SELECT * FROM surveys WHERE id = ?", (self.survey_id,))
-        survey_data = c.fetchone()
-        conn.close()
+        # Сводка по анкетам; сами ответы читаются из БД по мере надобности
+        activity = self.db.get_response_activity(self.survey_id)
         
-        if not survey_data:
+        # Заодно читаем статистику вопросов, по которой строятся графики
+        get_dataset(self.db, self.survey_id).stats
+        
+        return survey_data, questions, activity
+    
+    def on_data_loaded(self, data):
+        """Создает интерфейс по загруженным данным"""
+        self.loading_label.destroy()
+        
+        if data is None:
             messagebox.showerror("Ошибка", f"Опрос с ID {self.survey_id} не найден")
             self.master.destroy()
             return
-            
-        self.survey = dict(survey_data)
         
-        # Получаем вопросы опроса
-        self.questions = self.db.get_questions(self.survey_id)
+        self.survey, self.questions, self.activity = data
         
-        # Получаем ответы на опрос
-        self.responses = self.db.get_survey_responses(self.survey_id)
+        # Создаем интерфейс
+        self.create_widgets()
+    
+    def on_load_error(self, error):
+        """Сообщает об ошибке загрузки данных опроса"""
+        self.loading_label.config(text=f"Не удалось загрузить данные опроса: {error}")
     
     def create_widgets(self):
         """Создает интерфейс аналитики"""
@@ -76,15 +108,13 @@ class SurveyAnalytics:
              fg=self.theme.colors['primary']).pack(anchor=W)
         
         # Информация о количестве ответов
-        response_count = len(self.responses)
+        response_count = self.activity['count']
         response_info = f"Всего ответов: {response_count}"
         
         if response_count > 0:
-            # Определяем первый и последний ответ
-            dates = [r['completed_at'] for r in self.responses.values()]
-            dates.sort()
-            first_date = dates[0] if dates else "н/д"
-            last_date = dates[-1] if dates else "н/д"
+            # Первый и последний ответ
+            first_date = self.activity['first_response'] or "н/д"
+            last_date = self.activity['last_response'] or "н/д"
             
             response_info += f" | Первый ответ: {first_date} | Последний ответ: {last_date}"
         
@@ -94,7 +124,7 @@ class SurveyAnalytics:
              fg=self.theme.colors['text_secondary']).pack(anchor=W, pady=(10, 0))
         
         # Если нет ответов, показываем сообщение
-        if not self.responses:
+        if not response_count:
             no_data_frame = Frame(main_frame, bg=self.theme.colors['background'], padx=20, pady=40)
             no_data_frame.pack(fill=BOTH, expand=True)
             
@@ -124,6 +154,16 @@ class SurveyAnalytics:
         notebook.add(summary_frame, text="Сводка")
         self.create_summary_tab(summary_frame)
         
+        # Вкладка с таблицами сопряженности и срезами
+        segments_frame = Frame(notebook, bg=self.theme.colors['background'])
+        notebook.add(segments_frame, text="Срезы")
+        self.create_segments_tab(segments_frame)
+        
+        # Вкладка с поиском по текстовым ответам
+        search_frame = Frame(notebook, bg=self.theme.colors['background'])
+        notebook.add(search_frame, text="Поиск по ответам")
+        self.create_answer_search_tab(search_frame)
+        
         # Кнопка для экспорта данных
         export_button = ttk.Button(main_frame, text="Экспорт данных", 
                                 command=self.export_data, style="TButton")
@@ -135,73 +175,115 @@ class SurveyAnalytics:
         close_button.pack(pady=10)
     
     def create_raw_data_tab(self, parent):
-        """Создает вкладку с сырыми данными ответов"""
-        # Создаем фрейм с прокруткой
+        """Создает вкладку с сырыми данными ответов.
+        
+        Анкеты выводятся строками таблицы и подгружаются из БД страницами
+        по мере прокрутки, поэтому вкладка открывается одинаково быстро
+        при любом количестве ответов.
+        """
         main_frame = Frame(parent, bg=self.theme.colors['card'])
         main_frame.pack(fill=BOTH, expand=True, padx=10, pady=10)
         
-        # Создаем холст с прокруткой
-        canvas = Canvas(main_frame, bg=self.theme.colors['card'])
-        scrollbar = ttk.Scrollbar(main_frame, orient="vertical", command=canvas.yview)
-        scrollable_frame = Frame(canvas, bg=self.theme.colors['card'])
-        
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-        
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-        
         # Заголовок
-        Label(scrollable_frame, text="Ответы респондентов", 
+        Label(main_frame, text="Ответы респондентов",
              font=self.theme.fonts['subtitle'],
              bg=self.theme.colors['card'],
              fg=self.theme.colors['text']).pack(anchor=W, padx=20, pady=10)
         
-        # Добавляем карточку для каждого ответа
-        for response_id, response_data in self.responses.items():
-            response_frame = self.theme.create_card_frame(scrollable_frame)
-            response_frame.pack(fill=X, padx=20, pady=10)
-            
-            # Информация о респонденте
-            Label(response_frame, text=f"Респондент: {response_data['respondent']}", 
-                 font=self.theme.fonts['normal_bold']).pack(anchor=W, padx=10, pady=5)
-            
-            Label(response_frame, text=f"Дата: {response_data['completed_at']}", 
-                 font=self.theme.fonts['small']).pack(anchor=W, padx=10)
+        Label(main_frame, text="Двойной щелчок по строке открывает анкету целиком",
+             font=self.theme.fonts['small'],
+             bg=self.theme.colors['card'],
+             fg=self.theme.colors['text_secondary']).pack(anchor=W, padx=20)
+        
+        table_frame = Frame(main_frame, bg=self.theme.colors['card'])
+        table_frame.pack(fill=BOTH, expand=True, padx=20, pady=10)
+        
+        # Таблица: анкета - строка, вопрос - столбец
+        columns = ['id', 'respondent', 'completed_at'] + [f"q{q['id']}" for q in self.questions]
+        tree = ttk.Treeview(table_frame, columns=columns, show='headings')
+        yscroll = ttk.Scrollbar(table_frame, orient="vertical", command=tree.yview)
+        xscroll = ttk.Scrollbar(table_frame, orient="horizontal", command=tree.xview)
+        
+        tree.heading('id', text="ID")
+        tree.column('id', width=60, anchor=CENTER, stretch=False)
+        tree.heading('respondent', text="Респондент")
+        tree.column('respondent', width=120, stretch=False)
+        tree.heading('completed_at', text="Дата")
+        tree.column('completed_at', width=140, stretch=False)
+        for question in self.questions:
+            tree.heading(f"q{question['id']}", text=question['question_text'])
+            tree.column(f"q{question['id']}", width=180, stretch=False)
+        
+        yscroll.pack(side="right", fill="y")
+        xscroll.pack(side="bottom", fill="x")
+        tree.pack(side="left", fill=BOTH, expand=True)
+        
+        last_id = 0
+        exhausted = False
+        loading = False
+        
+        def load_page():
+            nonlocal last_id, exhausted, loading
+            loading = False
+            if exhausted:
+                return
             
-            # Разделитель
-            ttk.Separator(response_frame, orient=HORIZONTAL).pack(fill=X, padx=10, pady=10)
+            page = self.db.get_responses_page(self.survey_id, last_id, self.RAW_PAGE_SIZE)
+            for response_id, respondent, completed_at, answers in page:
+                values = [response_id, respondent, completed_at]
+                values.extend(answers.get(q['id']) or '' for q in self.questions)
+                tree.insert('', END, iid=str(response_id), values=values)
             
-            # Ответы на вопросы
-            for question in self.questions:
-                q_id = question['id']
-                if q_id in response_data['answers']:
-                    answer = response_data['answers'][q_id]
-                    
-                    # Вопрос
-                    Label(response_frame, text=question['question_text'], 
-                         font=self.theme.fonts['normal'],
-                         wraplength=700).pack(anchor=W, padx=10, pady=5)
-                    
-                    # Ответ
-                    answer_text = answer['answer_text']
-                    answer_frame = Frame(response_frame, bg=self.theme.colors['background'], padx=5, pady=5)
-                    answer_frame.pack(fill=X, padx=20, pady=5)
-                    
-                    Label(answer_frame, text=f"Ответ: {answer_text}", 
-                         font=self.theme.fonts['normal'],
-                         bg=self.theme.colors['background'],
-                         wraplength=650).pack(anchor=W, padx=5)
+            if page:
+                last_id = page[-1][0]
+            if len(page) < self.RAW_PAGE_SIZE:
+                exhausted = True
+        
+        def on_scroll(first, last):
+            nonlocal loading
+            yscroll.set(first, last)
+            # Подгружаем следующую страницу, когда прокрутка подходит к концу
+            if float(last) > 0.9 and not exhausted and not loading:
+                loading = True
+                tree.after_idle(load_page)
+        
+        def show_response(event):
+            item = tree.identify_row(event.y)
+            if item:
+                self.show_response_details(tree.item(item, 'values'))
+        
+        tree.configure(yscrollcommand=on_scroll, xscrollcommand=xscroll.set)
+        tree.bind("<Double-1>", show_response)
+        load_page()
+    
+    def show_response_details(self, values):
+        """Показывает одну анкету целиком в отдельном окне"""
+        window = Toplevel(self.master)
+        window.title(f"Анкета #{values[0]}")
+        window.geometry("600x500")
+        
+        text = Text(window, wrap=WORD, font=self.theme.fonts['normal'], padx=10, pady=10)
+        scrollbar = ttk.Scrollbar(window, orient="vertical", command=text.yview)
+        text.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        text.pack(fill=BOTH, expand=True)
+        
+        text.insert(END, f"Респондент: {values[1]}\nДата: {values[2]}\n\n")
+        for question, answer in zip(self.questions, values[3:]):
+            if answer:
+                text.insert(END, f"{question['question_text']}\nОтвет: {answer}\n\n")
+        text.configure(state=DISABLED)
     
     def create_charts_tab(self, parent):
-        """Создает вкладку с графиками"""
+        """Создает вкладку с графиками.
+        
+        Карточки вопросов со статистикой создаются сразу, а графики показываются,
+        только когда карточка попадает в видимую область. Графики, ушедшие
+        из вида, освобождаются, так что одновременно их не больше MAX_RENDERED_CHARTS.
+        Сами изображения берутся из кэша и перерисовываются, только если данные изменились.
+        """
         # Проверяем наличие данных
-        if not self.responses:
+        if not self.activity['count']:
             Label(parent, text="Нет данных для отображения графиков", 
                  font=self.theme.fonts['subtitle']).pack(pady=50)
             return
@@ -221,23 +303,21 @@ class SurveyAnalytics:
         )
         
         canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
         
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
-        # Генерируем графики для каждого вопроса, где это возможно
+        # Итоги по вопросам считает аналитический движок
+        dataset = get_dataset(self.db, self.survey_id)
+        
+        # Карточки вопросов; место под график резервируется, сам график рисуется позже
+        self.chart_slots = []
+        self.rendered_charts = []
         for question in self.questions:
-            q_id = question['id']
-            q_type = question['question_type']
-            
-            # Собираем все ответы на этот вопрос
-            answers = []
-            for response in self.responses.values():
-                if q_id in response['answers']:
-                    answers.append(response['answers'][q_id]['answer_text'])
-            
-            if not answers:
+            # Статистика ответов на этот вопрос
+            stats = dataset.summary(question['id'])
+            kind = stats['kind']
+            if not stats['count']:
                 continue
             
             # Создаем фрейм для графика
@@ -248,121 +328,119 @@ class SurveyAnalytics:
             Label(chart_frame, text=question['question_text'], 
                  font=self.theme.fonts['normal_bold']).pack(anchor=W, padx=10, pady=5)
             
-            # Генерируем график в зависимости от типа вопроса
-            if q_type in ['radio', 'checkbox', 'select']:
-                # Для вариантов ответов - столбчатая диаграмма
-                if q_type == 'checkbox':
-                    # Для чекбоксов разбиваем ответы по запятым
-                    all_options = []
-                    for answer in answers:
-                        options = [o.strip() for o in answer.split(',')]
-                        all_options.extend(options)
-                    
-                    counts = Counter(all_options)
-                else:
-                    counts = Counter(answers)
-                
-                # Создаем фигуру
-                fig, ax = plt.subplots(figsize=(8, 4))
-                
-                # Данные для диаграммы
-                labels = list(counts.keys())
-                values = list(counts.values())
-                
-                # Ограничиваем количество отображаемых вариантов
-                if len(labels) > 10:
-                    # Сортируем по частоте и берем топ-10
-                    sorted_items = sorted(counts.items(), key=lambda x: x[1], reverse=True)
-                    labels = [item[0] for item in sorted_items[:10]]
-                    values = [item[1] for item in sorted_items[:10]]
-                
-                # Горизонтальная столбчатая диаграмма для лучшей читаемости длинных меток
-                y_pos = np.arange(len(labels))
-                ax.barh(y_pos, values, align='center', color=self.theme.colors['primary'])
-                ax.set_yticks(y_pos)
-                ax.set_yticklabels(labels)
-                ax.invert_yaxis()  # Метки сверху вниз
-                ax.set_xlabel('Количество')
-                ax.set_title('Распределение ответов')
-                
-                # Добавляем числовые значения на столбцы
-                for i, v in enumerate(values):
-                    ax.text(v + 0.1, i, str(v), color='black', va='center')
-                
-                plt.tight_layout()
-                
-                # Размещаем график в интерфейсе
-                chart_canvas = FigureCanvasTkAgg(fig, master=chart_frame)
-                chart_canvas.draw()
-                chart_canvas.get_tk_widget().pack(fill=BOTH, padx=10, pady=10)
-                
-            elif q_type in ['text', 'textarea']:
-                # Для текстовых ответов - показываем облако слов или статистику длины
+            if kind == 'text':
+                # Для текстовых ответов - статистика длины
                 Label(chart_frame, text="Текстовые ответы - статистика", 
                      font=self.theme.fonts['small']).pack(pady=5)
                 
-                # Статистика по длине ответов
-                lengths = [len(a) for a in answers]
-                avg_len = sum(lengths) / len(lengths) if lengths else 0
-                
-                stats_text = f"Количество ответов: {len(answers)}\n"
-                stats_text += f"Средняя длина ответа: {avg_len:.1f} символов\n"
-                stats_text += f"Самый короткий ответ: {min(lengths)} символов\n"
-                stats_text += f"Самый длинный ответ: {max(lengths)} символов"
+                stats_text = f"Количество ответов: {stats['count']}\n"
+                stats_text += f"Средняя длина ответа: {stats['mean']:.1f} символов\n"
+                stats_text += f"Медиана длины: {stats['quantiles'][0.5]:.0f} символов\n"
+                stats_text += f"Самый короткий ответ: {stats['min']:.0f} символов\n"
+                stats_text += f"Самый длинный ответ: {stats['max']:.0f} символов"
                 
                 Label(chart_frame, text=stats_text).pack(pady=10)
                 
-                # Гистограмма длины ответов
-                fig, ax = plt.subplots(figsize=(8, 3))
-                ax.hist(lengths, bins=10, color=self.theme.colors['primary'])
-                ax.set_xlabel('Длина ответа (символов)')
-                ax.set_ylabel('Частота')
-                ax.set_title('Распределение длин ответов')
+            elif kind == 'number':
+                if stats['mean'] is None:
+                    # Среди ответов нет ни одного числа
+                    Label(chart_frame, text="Невозможно создать график для этих данных").pack(pady=10)
+                    continue
                 
-                plt.tight_layout()
+                stats_text = f"Количество ответов: {stats['count']}\n"
+                stats_text += f"Среднее значение: {stats['mean']:.2f}\n"
+                stats_text += f"Медиана: {stats['quantiles'][0.5]:g}\n"
+                stats_text += f"Стандартное отклонение: {stats['std']:.2f}\n"
+                stats_text += f"Минимум: {stats['min']}\n"
+                stats_text += f"Максимум: {stats['max']}"
                 
-                # Размещаем график в интерфейсе
-                chart_canvas = FigureCanvasTkAgg(fig, master=chart_frame)
-                chart_canvas.draw()
-                chart_canvas.get_tk_widget().pack(fill=BOTH, padx=10, pady=10)
+                Label(chart_frame, text=stats_text).pack(pady=10)
+            
+            # Место под график фиксированной высоты, чтобы прокрутка не прыгала
+            width, height = self.CHART_SIZES[kind]
+            placeholder = Frame(chart_frame, height=int(height * self.CHART_DPI),
+                                bg=self.theme.colors['card'])
+            placeholder.pack(fill=X, padx=10, pady=10)
+            placeholder.pack_propagate(False)
+            
+            self.chart_slots.append({'question_id': question['id'], 'stats': stats,
+                                     'frame': placeholder, 'chart': None})
+        
+        update_pending = False
+        
+        def update_charts():
+            nonlocal update_pending
+            update_pending = False
+            self.update_visible_charts(canvas, scrollable_frame)
+        
+        def schedule_update(*args):
+            nonlocal update_pending
+            if not update_pending:
+                update_pending = True
+                canvas.after_idle(update_charts)
+        
+        def on_view_changed(first, last):
+            scrollbar.set(first, last)
+            schedule_update()
+        
+        canvas.configure(yscrollcommand=on_view_changed)
+        # Первые графики рисуются, когда вкладка показана и холст получил размер
+        canvas.bind("<Configure>", schedule_update)
+        canvas.bind("<Map>", schedule_update)
+    
+    def update_visible_charts(self, canvas, scrollable_frame):
+        """Рисует графики карточек в видимой области и освобождает лишние"""
+        if not canvas.winfo_ismapped():
+            return
+        
+        # Видимая область холста с запасом в половину экрана
+        margin = canvas.winfo_height() // 2
+        top = canvas.canvasy(0) - margin
+        bottom = canvas.canvasy(canvas.winfo_height()) + margin
+        frame_top = scrollable_frame.winfo_rooty()
+        
+        visible = []
+        for slot in self.chart_slots:
+            slot_top = slot['frame'].winfo_rooty() - frame_top
+            slot_bottom = slot_top + slot['frame'].winfo_height()
+            if slot_bottom >= top and slot_top <= bottom:
+                visible.append(slot)
+        
+        for slot in visible:
+            if slot['chart'] is None:
+                self.render_chart(slot)
+                self.rendered_charts.append(slot)
+        
+        # Освобождаем самые давние графики за пределами видимой области
+        for slot in list(self.rendered_charts):
+            if len(self.rendered_charts) <= self.MAX_RENDERED_CHARTS:
+                break
+            if slot not in visible:
+                self.release_chart(slot)
+                self.rendered_charts.remove(slot)
+    
+    def render_chart(self, slot):
+        """Показывает график вопроса: готовый PNG из кэша или отрисованный заново"""
+        stats = slot['stats']
+        png = self.chart_cache.get_or_render(self.survey_id, slot['question_id'], stats,
+                                             self.theme.colors['primary'],
+                                             self.CHART_SIZES[stats['kind']], self.CHART_DPI)
+        
+        image = PhotoImage(data=base64.b64encode(png))
+        chart_label = Label(slot['frame'], image=image, bg=self.theme.colors['card'])
+        chart_label.image = image  # Держим ссылку, иначе изображение удалит сборщик мусора
+        chart_label.pack(fill=BOTH, expand=True)
+        slot['chart'] = chart_label
                 
-            elif q_type == 'number':
-                # Для числовых ответов - гистограмма
-                try:
-                    numeric_answers = [float(a) for a in answers]
-                    
-                    # Статистика
-                    avg = sum(numeric_answers) / len(numeric_answers) if numeric_answers else 0
-                    
-                    stats_text = f"Количество ответов: {len(numeric_answers)}\n"
-                    stats_text += f"Среднее значение: {avg:.2f}\n"
-                    stats_text += f"Минимум: {min(numeric_answers)}\n"
-                    stats_text += f"Максимум: {max(numeric_answers)}"
-                    
-                    Label(chart_frame, text=stats_text).pack(pady=10)
-                    
-                    # Гистограмма
-                    fig, ax = plt.subplots(figsize=(8, 3))
-                    ax.hist(numeric_answers, bins=10, color=self.theme.colors['primary'])
-                    ax.set_xlabel('Значение')
-                    ax.set_ylabel('Частота')
-                    ax.set_title('Распределение числовых ответов')
-                    
-                    plt.tight_layout()
-                    
-                    # Размещаем график в интерфейсе
-                    chart_canvas = FigureCanvasTkAgg(fig, master=chart_frame)
-                    chart_canvas.draw()
-                    chart_canvas.get_tk_widget().pack(fill=BOTH, padx=10, pady=10)
-                    
-                except ValueError:
-                    # Если не удалось преобразовать в числа
-                    Label(chart_frame, text="Невозможно создать график для этих данных").pack(pady=10)
+    def release_chart(self, slot):
+        """Удаляет показанный график, место под него остается"""
+        slot['chart'].destroy()
+        slot['chart'] = None
     
     def create_summary_tab(self, parent):
         """Создает вкладку с сводными данными"""
         # Проверяем наличие данных
-        if not self.responses:
+        if not self.activity['count']:
             Label(parent, text="Нет данных для отображения сводки", 
                  font=self.theme.fonts['subtitle']).pack(pady=50)
             return
@@ -383,19 +461,13 @@ class SurveyAnalytics:
         Label(stats_frame, text="Общая статистика", 
              font=self.theme.fonts['normal_bold']).pack(anchor=W, padx=10, pady=5)
         
-        total_responses = len(self.responses)
+        total_responses = self.activity['count']
         
-        # Определяем даты ответов
-        dates = {}
-        for r in self.responses.values():
-            date_str = r['completed_at'].split()[0]  # Берем только дату без времени
-            if date_str in dates:
-                dates[date_str] += 1
-            else:
-                dates[date_str] = 1
+        # Количество ответов по дням (посчитано в БД)
+        dates = {day: count for day, count in self.activity['per_day'] if day}
         
         stats_text = f"Всего ответов: {total_responses}\n"
-        stats_text += f"Количество уникальных респондентов: {len(set(r['respondent'] for r in self.responses.values()))}\n"
+        stats_text += f"Количество уникальных респондентов: {self.activity['respondents']}\n"
         stats_text += f"Количество дней с ответами: {len(dates)}\n"
         
         if dates:
@@ -406,7 +478,8 @@ class SurveyAnalytics:
         
         # Динамика ответов по дням
         if len(dates) > 1:
-            fig, ax = plt.subplots(figsize=(8, 4))
+            fig = Figure(figsize=(8, 4), dpi=self.CHART_DPI)
+            ax = fig.add_subplot(111)
             
             sorted_dates = sorted(dates.items())
             x = [d[0] for d in sorted_dates]
@@ -418,8 +491,10 @@ class SurveyAnalytics:
             ax.set_title('Динамика ответов по дням')
             
             # Поворачиваем метки дат для лучшей читаемости
-            plt.xticks(rotation=45, ha='right')
-            plt.tight_layout()
+            for label in ax.get_xticklabels():
+                label.set_rotation(45)
+                label.set_horizontalalignment('right')
+            fig.tight_layout()
             
             chart_frame = Frame(summary_frame, bg=self.theme.colors['card'])
             chart_frame.pack(fill=BOTH, pady=10)
@@ -428,58 +503,292 @@ class SurveyAnalytics:
             chart_canvas.draw()
             chart_canvas.get_tk_widget().pack(fill=BOTH)
     
+    def create_segments_tab(self, parent):
+        """Создает вкладку с таблицей сопряженности двух вопросов и фильтрами"""
+        dataset = get_dataset(self.db, self.survey_id)
+        titles = [f"{i + 1}. {q['question_text']}" for i, q in enumerate(self.questions)]
+        
+        controls = Frame(parent, bg=self.theme.colors['card'], padx=20, pady=10)
+        controls.pack(fill=X)
+        
+        # Вопросы для строк и столбцов таблицы
+        Label(controls, text="Строки:", bg=self.theme.colors['card']).grid(row=0, column=0, sticky=W)
+        row_var = StringVar()
+        ttk.Combobox(controls, textvariable=row_var, values=titles, state="readonly",
+                    width=40).grid(row=0, column=1, sticky=W, padx=5, pady=2)
+        
+        Label(controls, text="Столбцы:", bg=self.theme.colors['card']).grid(row=1, column=0, sticky=W)
+        column_var = StringVar()
+        ttk.Combobox(controls, textvariable=column_var, values=titles, state="readonly",
+                    width=40).grid(row=1, column=1, sticky=W, padx=5, pady=2)
+        
+        # Фильтр по ответу на вопрос
+        Label(controls, text="Фильтр по вопросу:", bg=self.theme.colors['card']).grid(row=2, column=0, sticky=W)
+        filter_var = StringVar()
+        filter_combo = ttk.Combobox(controls, textvariable=filter_var, values=[''] + titles,
+                                   state="readonly", width=40)
+        filter_combo.grid(row=2, column=1, sticky=W, padx=5, pady=2)
+        
+        Label(controls, text="Ответ:", bg=self.theme.colors['card']).grid(row=2, column=2, sticky=W)
+        value_var = StringVar()
+        value_combo = ttk.Combobox(controls, textvariable=value_var, state="readonly", width=25)
+        value_combo.grid(row=2, column=3, sticky=W, padx=5, pady=2)
+        
+        # Период завершения анкет
+        Label(controls, text="Дата с (ГГГГ-ММ-ДД):", bg=self.theme.colors['card']).grid(row=3, column=0, sticky=W)
+        date_from_var = StringVar()
+        ttk.Entry(controls, textvariable=date_from_var, width=15).grid(row=3, column=1, sticky=W, padx=5, pady=2)
+        
+        Label(controls, text="по:", bg=self.theme.colors['card']).grid(row=3, column=2, sticky=W)
+        date_to_var = StringVar()
+        ttk.Entry(controls, textvariable=date_to_var, width=15).grid(row=3, column=3, sticky=W, padx=5, pady=2)
+        
+        def selected_question(variable):
+            title = variable.get()
+            return self.questions[titles.index(title)] if title in titles else None
+        
+        def on_filter_selected(event=None):
+            # Значения для фильтра - варианты ответа выбранного вопроса
+            question = selected_question(filter_var)
+            labels = []
+            if question and question_kind(question['question_type']) in ('choice', 'multi_choice'):
+                labels = dataset.column(question['id']).labels
+            value_combo['values'] = labels
+            value_var.set('')
+        
+        filter_combo.bind("<<ComboboxSelected>>", on_filter_selected)
+        
+        result_label = Label(parent, text="", bg=self.theme.colors['background'], justify=LEFT)
+        result_label.pack(anchor=W, padx=20, pady=5)
+        
+        table_frame = Frame(parent, bg=self.theme.colors['background'])
+        table_frame.pack(fill=BOTH, expand=True, padx=20, pady=10)
+        table = None
+        
+        def build():
+            nonlocal table
+            row_question = selected_question(row_var)
+            column_question = selected_question(column_var)
+            if not row_question or not column_question:
+                messagebox.showinfo("Информация", "Выберите вопросы для строк и столбцов")
+                return
+            
+            filters = {}
+            filter_question = selected_question(filter_var)
+            if filter_question and value_var.get():
+                filters['by_question'] = filter_question['id']
+                filters['values'] = [value_var.get()]
+            try:
+                if date_from_var.get().strip():
+                    filters['date_from'] = date_from_var.get().strip()
+                if date_to_var.get().strip():
+                    filters['date_to'] = date_to_var.get().strip()
+                result = dataset.crosstab(row_question['id'], column_question['id'], **filters)
+            except ValueError:
+                messagebox.showerror("Ошибка", "Дата должна быть в формате ГГГГ-ММ-ДД")
+                return
+            
+            # Пересоздаем таблицу под новый набор столбцов
+            if table is not None:
+                table.destroy()
+            columns = ['row'] + [f"c{i}" for i in range(len(result['column_labels']))] + ['total']
+            table = ttk.Treeview(table_frame, columns=columns, show='headings')
+            table.heading('row', text=row_question['question_text'])
+            table.column('row', width=200, anchor=W)
+            for name, label in zip(columns[1:-1], result['column_labels']):
+                table.heading(name, text=label)
+                table.column(name, width=90, anchor=CENTER)
+            table.heading('total', text="Всего")
+            table.column('total', width=80, anchor=CENTER)
+            
+            for label, counts in zip(result['row_labels'], result['table'].tolist()):
+                table.insert('', END, values=[label] + counts + [sum(counts)])
+            totals = result['table'].sum(axis=0).tolist()
+            table.insert('', END, values=["Всего"] + totals + [sum(totals)])
+            table.pack(fill=BOTH, expand=True)
+            
+            result_label.config(text=f"Анкет с ответами на оба вопроса: {result['count']}")
+        
+        ttk.Button(controls, text="Построить", command=build,
+                  style="TButton").grid(row=4, column=0, columnspan=2, sticky=W, pady=10)
+    
+    def create_answer_search_tab(self, parent):
+        """Создает вкладку полнотекстового поиска по ответам на текстовые вопросы"""
+        text_questions = [q for q in self.questions if q['question_type'] in ('text', 'textarea')]
+        question_texts = {q['id']: q['question_text'] for q in text_questions}
+        all_questions = "Все текстовые вопросы"
+        titles = [all_questions] + [q['question_text'] for q in text_questions]
+        
+        controls = Frame(parent, bg=self.theme.colors['card'], padx=20, pady=10)
+        controls.pack(fill=X)
+        
+        if not text_questions:
+            Label(controls, text="В опросе нет текстовых вопросов",
+                 font=self.theme.fonts['normal'],
+                 bg=self.theme.colors['card'],
+                 fg=self.theme.colors['text_secondary']).pack(anchor=W)
+            return
+        
+        Label(controls, text="Слова:", bg=self.theme.colors['card']).grid(row=0, column=0, sticky=W)
+        search_var = StringVar()
+        search_entry = ttk.Entry(controls, textvariable=search_var, width=40)
+        search_entry.grid(row=0, column=1, sticky=W, padx=5, pady=2)
+        
+        Label(controls, text="Вопрос:", bg=self.theme.colors['card']).grid(row=1, column=0, sticky=W)
+        question_var = StringVar(value=all_questions)
+        ttk.Combobox(controls, textvariable=question_var, values=titles, state="readonly",
+                    width=40).grid(row=1, column=1, sticky=W, padx=5, pady=2)
+        
+        result_label = Label(parent, text="Двойной щелчок по строке открывает анкету целиком",
+                            bg=self.theme.colors['background'], justify=LEFT)
+        result_label.pack(anchor=W, padx=20, pady=5)
+        
+        table_frame = Frame(parent, bg=self.theme.colors['background'])
+        table_frame.pack(fill=BOTH, expand=True, padx=20, pady=10)
+        
+        columns = ['response', 'respondent', 'completed_at', 'question', 'snippet']
+        tree = ttk.Treeview(table_frame, columns=columns, show='headings')
+        yscroll = ttk.Scrollbar(table_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=yscroll.set)
+        
+        tree.heading('response', text="ID анкеты")
+        tree.column('response', width=80, anchor=CENTER, stretch=False)
+        tree.heading('respondent', text="Респондент")
+        tree.column('respondent', width=120, stretch=False)
+        tree.heading('completed_at', text="Дата")
+        tree.column('completed_at', width=140, stretch=False)
+        tree.heading('question', text="Вопрос")
+        tree.column('question', width=200, stretch=False)
+        tree.heading('snippet', text="Фрагмент ответа")
+        tree.column('snippet', width=400)
+        
+        yscroll.pack(side="right", fill="y")
+        tree.pack(side="left", fill=BOTH, expand=True)
+        
+        more_button = ttk.Button(parent, text="Показать еще", style="TButton")
+        
+        # Параметры текущего поиска и ключ последней показанной строки
+        query = {}
+        last_id = None
+        search_task = None
+        
+        def load_page():
+            nonlocal search_task
+            if search_task is not None:
+                search_task.cancel()
+            more_button.state(['disabled'])
+            search_task = self.loader.submit(
+                lambda: self.db.search_answers(self.survey_id, query['text'], query['question_id'],
+                                               last_id, self.RAW_PAGE_SIZE),
+                on_page_loaded, on_search_error)
+        
+        def on_page_loaded(rows):
+            nonlocal last_id
+            for answer_id, response_id, respondent, completed_at, question_id, snippet in rows:
+                tree.insert('', END, iid=str(answer_id),
+                            values=[response_id, respondent or '', completed_at or '',
+                                    question_texts.get(question_id, ''), snippet or ''])
+            if rows:
+                last_id = rows[-1][0]
+            
+            shown = len(tree.get_children())
+            result_label.config(text=f"Найдено ответов: {shown}" if shown else "Ничего не найдено")
+            
+            # Кнопка нужна, только если страница заполнена целиком
+            if len(rows) == self.RAW_PAGE_SIZE:
+                more_button.state(['!disabled'])
+                more_button.pack(pady=5)
+            else:
+                more_button.pack_forget()
+        
+        def on_search_error(error):
+            print(f"Ошибка поиска по ответам: {error}")
+            result_label.config(text="Не удалось выполнить поиск")
+        
+        def search(event=None):
+            nonlocal last_id
+            text = search_var.get().strip()
+            if not text:
+                messagebox.showinfo("Информация", "Введите слова для поиска")
+                return
+            
+            question_id = None
+            if question_var.get() in titles[1:]:
+                question_id = text_questions[titles.index(question_var.get()) - 1]['id']
+            
+            query['text'] = text
+            query['question_id'] = question_id
+            last_id = None
+            tree.delete(*tree.get_children())
+            result_label.config(text="Поиск...")
+            load_page()
+        
+        def show_response(event):
+            item = tree.identify_row(event.y)
+            if not item:
+                return
+            
+            # Анкету целиком достаем той же выборкой, что и для вкладки сырых данных
+            response_id = int(tree.item(item, 'values')[0])
+            page = self.db.get_responses_page(self.survey_id, response_id - 1, 1)
+            if page and page[0][0] == response_id:
+                _, respondent, completed_at, answers = page[0]
+                values = [response_id, respondent, completed_at]
+                values.extend(answers.get(q['id']) or '' for q in self.questions)
+                self.show_response_details(values)
+        
+        more_button.configure(command=load_page)
+        ttk.Button(controls, text="Найти", command=search,
+                  style="TButton").grid(row=2, column=0, columnspan=2, sticky=W, pady=10)
+        search_entry.bind("<Return>", search)
+        tree.bind("<Double-1>", show_response)
+    
     def export_data(self):
-        """Экспортирует данные опроса в CSV файл"""
-        import csv
+        """Экспортирует данные опроса в CSV, JSON Lines или NumPy (.npz)"""
         from tkinter import filedialog
-        import os
+        from survey_export import export_survey
         
-        if not self.responses:
+        if not self.activity['count']:
             messagebox.showinfo("Информация", "Нет данных для экспорта")
             return
         
         # Диалог выбора файла
         file_path = filedialog.asksaveasfilename(
             defaultextension=".csv",
-            filetypes=[("CSV файлы", "*.csv"), ("Все файлы", "*.*")],
+            filetypes=[("CSV файлы", "*.csv"),
+                       ("JSON Lines", "*.jsonl"),
+                       ("Колоночный формат NumPy", "*.npz"),
+                       ("Все файлы", "*.*")],
             title="Сохранить данные опроса"
         )
         
         if not file_path:
             return
         
+        # Окно с индикатором прогресса экспорта
+        progress_window = Toplevel(self.master)
+        progress_window.title("Экспорт данных")
+        progress_window.transient(self.master)
+        
+        progress_label = Label(progress_window, text="Подготовка экспорта...")
+        progress_label.pack(padx=20, pady=(20, 10))
+        
+        progress_bar = ttk.Progressbar(progress_window, mode='determinate', length=300)
+        progress_bar.pack(padx=20, pady=(0, 20))
+        
+        def on_progress(done, total):
+            progress_bar['maximum'] = max(total, 1)
+            progress_bar['value'] = done
+            progress_label.config(text=f"Выгружено анкет: {done} из {total}")
+            progress_window.update_idletasks()
+        
         try:
-            with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-                csvwriter = csv.writer(csvfile)
-                
-                # Собираем заголовки
-                headers = ['ID ответа', 'Респондент', 'Дата завершения']
-                question_map = {}
-                
-                for q in self.questions:
-                    headers.append(q['question_text'])
-                    question_map[q['id']] = len(headers) - 1
-                
-                csvwriter.writerow(headers)
-                
-                # Записываем данные
-                for response_id, response_data in self.responses.items():
-                    row = [response_id, response_data['respondent'], response_data['completed_at']]
-                    
-                    # Заполняем пустые значения для всех вопросов
-                    row.extend([''] * len(self.questions))
-                    
-                    # Заполняем имеющиеся ответы
-                    for q_id, answer in response_data['answers'].items():
-                        if q_id in question_map:
-                            col_index = question_map[q_id]
-                            row[col_index] = answer['answer_text']
-                    
-                    csvwriter.writerow(row)
-            
+            export_survey(self.db, self.survey_id, file_path, progress=on_progress)
+            progress_window.destroy()
             messagebox.showinfo("Успех", f"Данные успешно экспортированы в\n{file_path}")
             
         except Exception as e:
+            progress_window.destroy()
             messagebox.showerror("Ошибка", f"Не удалось экспортировать данные: {str(e)}")
 
 if __name__ == "__main__":
@@ -0,0 +1,110 @@
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+
+# Кэш "скомпилированных" опросов для прохождения.
+# Популярный опрос открывают сотни респондентов, и каждый раз из БД читаются
+# одни и те же строка опроса и вопросы с разбором JSON вариантов ответа.
+# Скомпилированный опрос собирается один раз и дальше только читается: строки
+# доступны только для чтения, варианты ответа - кортежи, правила проверки
+# ответов подготовлены заранее. Запись в опрос или его вопросы сбрасывает кэш.
+
+class CompiledSurvey:
+    """Неизменяемое описание опроса: строка опроса, вопросы по порядку и правила проверки"""
+    
+    __slots__ = ('id', 'survey', 'questions', '_rules')
+    
+    def __init__(self, survey, questions):
+        self.id = survey['id']
+        self.survey = MappingProxyType(dict(survey))
+        
+        compiled = []
+        rules = []
+        for question in questions:
+            question = dict(question)
+            question['options'] = tuple(question['options'] or ())
+            compiled.append(MappingProxyType(question))
+            
+            # Правило: (id, текст, тип, обязательный, допустимые варианты)
+            rules.append((question['id'], question['question_text'], question['question_type'],
+                          question['required'] == 1, frozenset(question['options'])))
+        self.questions = tuple(compiled)
+        self._rules = tuple(rules)
+    
+    @property
+    def is_active(self):
+        return self.survey['is_active'] == 1
+    
+    def validate(self, answers):
+        """Проверяет ответы {question_id: ответ}, возвращает текст первого вопроса с ошибкой или None.
+        
+        Ответ на обязательный вопрос не может быть пустым, ответ с одним вариантом
+        должен быть одним из вариантов, а множественный выбор - индексами вариантов.
+        """
+        for question_id, question_text, question_type, required, options in self._rules:
+            answer = answers.get(question_id)
+            if not answer:
+                if required:
+                    return question_text
+                continue
+            
+            if question_type == 'radio' and options and answer not in options:
+                return question_text
+            if question_type == 'checkbox' and isinstance(answer, (list, tuple)):
+                if any(isinstance(index, int) and not 0 <= index < len(options) for index in answer):
+                    return question_text
+        return None
+
+class SurveyCache:
+    """LRU-кэш скомпилированных опросов со счетчиками попаданий и промахов"""
+    
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self._surveys = OrderedDict()
+        self._lock = threading.Lock()
+        # Растет при каждом сбросе: опрос, прочитанный до сброса, не попадет в кэш
+        self._generation = 0
+        
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, survey_id, load):
+        """Скомпилированный опрос из кэша; при промахе собирается через load(survey_id).
+        
+        load возвращает CompiledSurvey или None, если опроса нет (отсутствие не кэшируется).
+        """
+        with self._lock:
+            compiled = self._surveys.get(survey_id)
+            if compiled is not None:
+                self._surveys.move_to_end(survey_id)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+            generation = self._generation
+        
+        compiled = load(survey_id)
+        if compiled is None:
+            return None
+        
+        with self._lock:
+            if generation != self._generation:
+                return compiled
+            self._surveys[survey_id] = compiled
+            self._surveys.move_to_end(survey_id)
+            while len(self._surveys) > self.max_size:
+                self._surveys.popitem(last=False)
+        return compiled
+    
+    def invalidate(self, survey_id=None):
+        """Сбрасывает опрос из кэша (или весь кэш, если survey_id не указан)"""
+        with self._lock:
+            self._generation += 1
+            if survey_id is None:
+                self._surveys.clear()
+            else:
+                self._surveys.pop(survey_id, None)
+    
+    def stats(self):
+        """Счетчики кэша для диагностики"""
+        with self._lock:
+            return {'size': len(self._surveys), 'hits': self.hits, 'misses': self.misses}
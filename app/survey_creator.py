@@ -1,7 +1,7 @@
 from tkinter import *
 from tkinter import ttk
 from tkinter import messagebox
-from database import Database
+from database import get_database
 from styles import AppTheme
 import json
 
@@ -10,7 +10,7 @@ class SurveyCreator:
         self.master = master if master else Toplevel()
         self.master.title("Создание опроса")
         self.master.geometry("900x700")
-        self.db = db if db else Database()
+        self.db = db if db else get_database()
         self.username = username
         self.survey_id = survey_id  # None для нового опроса, id для редактирования
         self.questions = []
@@ -239,16 +239,10 @@ class SurveyCreator:
             # (для простоты в данном примере не реализован)
             messagebox.showinfo("Информация", "Обновление существующих опросов в этой версии не поддерживается")
             return
-        else:
-            survey_id = self.db.create_survey(title, description, self.username)
-            if not survey_id:
-                messagebox.showerror("Ошибка", "Не удалось создать опрос")
-                return
-        
-        # Сохраняем вопросы
-        for position, question_frame in enumerate(self.questions, 1):
-            question_text = question_frame.question_text_entry.get()
-            required = question_frame.required_var.get()
+        
+        # Собираем вопросы
+        questions = []
+        for question_frame in self.questions:
             question_type = question_frame.question_type
             
             # Получаем варианты ответов, если есть
@@ -256,18 +250,18 @@ class SurveyCreator:
             if question_type in ["radio", "checkbox"] and question_frame.options_list:
                 options = [entry.get() for entry in question_frame.options_list if entry.get()]
             
-            # Если редактирование и у вопроса есть ID, обновляем его
-            # (не реализовано в этом примере)
-            
-            # Добавляем новый вопрос
-            self.db.add_question(
-                survey_id,
-                question_text,
-                question_type,
-                required,
-                options,
-                position
-            )
+            questions.append({
+                'question_text': question_frame.question_text_entry.get(),
+                'question_type': question_type,
+                'required': question_frame.required_var.get(),
+                'options': options
+            })
+        
+        # Сохраняем опрос и вопросы одной транзакцией
+        survey_id = self.db.create_survey_with_questions(title, description, self.username, questions)
+        if not survey_id:
+            messagebox.showerror("Ошибка", "Не удалось создать опрос")
+            return
         
         messagebox.showinfo("Успех", "Опрос успешно создан")
         self.master.destroy()
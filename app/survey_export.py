@@ -0,0 +1,249 @@
+import csv
+import json
+import os
+import datetime
+from array import array
+
+# Экспорт результатов опроса.
+# Ответы читаются из БД курсором порциями и разворачиваются в строки
+# "одна анкета - одна строка" на лету, поэтому память не зависит от размера опроса.
+
+def iter_response_records(db, survey_id, questions, chunk_size=1000, option_questions=()):
+    """Отдает анкеты опроса по одной: (response_id, respondent, completed_at, ответы по колонкам).
+    
+    Для вопросов из option_questions (id вопросов с множественным выбором) ответ -
+    список индексов выбранных вариантов из answer_options, а не текст.
+    """
+    columns = {question['id']: index for index, question in enumerate(questions)}
+    with_options = bool(option_questions)
+    
+    current_id = None
+    record = None
+    for row in db.iter_survey_answers(survey_id, chunk_size, with_options):
+        response_id, respondent, completed_at, question_id, answer_text = row[:5]
+        if response_id != current_id:
+            if record is not None:
+                yield record
+            current_id = response_id
+            empty = [[] if question['id'] in option_questions else '' for question in questions]
+            record = (response_id, respondent or '', completed_at, empty)
+        
+        if question_id in columns:
+            record[3][columns[question_id]] = row[5] if question_id in option_questions else answer_text
+    
+    if record is not None:
+        yield record
+
+def export_csv(db, survey_id, file_path, progress=None, chunk_size=1000):
+    """Потоково выгружает ответы опроса в CSV, возвращает число выгруженных анкет.
+    
+    progress(done, total) вызывается после каждой порции анкет.
+    """
+    questions = db.get_questions(survey_id)
+    total = db.count_survey_responses(survey_id)
+    
+    written = 0
+    with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
+        csvwriter = csv.writer(csvfile)
+        
+        # Заголовки
+        headers = ['ID ответа', 'Респондент', 'Дата завершения']
+        headers.extend(q['question_text'] for q in questions)
+        csvwriter.writerow(headers)
+        
+        # Записываем анкеты по мере чтения из БД
+        for response_id, respondent, completed_at, answers in iter_response_records(db, survey_id, questions, chunk_size):
+            csvwriter.writerow([response_id, respondent, completed_at] + answers)
+            written += 1
+            
+            if progress and written % chunk_size == 0:
+                progress(written, total)
+    
+    if progress:
+        progress(written, total)
+    return written
+
+def export_jsonl(db, survey_id, file_path, progress=None, chunk_size=1000):
+    """Потоково выгружает ответы опроса в JSON Lines (одна анкета - одна строка)"""
+    questions = db.get_questions(survey_id)
+    total = db.count_survey_responses(survey_id)
+    
+    written = 0
+    with open(file_path, 'w', encoding='utf-8') as jsonfile:
+        for response_id, respondent, completed_at, answers in iter_response_records(db, survey_id, questions, chunk_size):
+            record = {
+                'response_id': response_id,
+                'respondent': respondent,
+                'completed_at': completed_at,
+                'answers': {str(q['id']): answer for q, answer in zip(questions, answers) if answer != ''}
+            }
+            jsonfile.write(json.dumps(record, ensure_ascii=False))
+            jsonfile.write('\n')
+            written += 1
+            
+            if progress and written % chunk_size == 0:
+                progress(written, total)
+    
+    if progress:
+        progress(written, total)
+    return written
+
+class _DictionaryColumn:
+    """Колонка со словарным кодированием: значение заменяется индексом в словаре (-1 - нет ответа)"""
+    
+    def __init__(self, values=()):
+        self.dictionary = list(values)
+        self.index = {value: code for code, value in enumerate(self.dictionary)}
+        self.codes = array('i')
+    
+    def append(self, value):
+        if value is None or value == '':
+            self.codes.append(-1)
+            return
+        
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.dictionary)
+            self.dictionary.append(value)
+        self.codes.append(code)
+    
+    def to_arrays(self, np, name):
+        return {
+            name: np.array(self.codes, dtype=np.int32),
+            name + '__dictionary': np.array(self.dictionary, dtype=str)
+        }
+
+class _BitmaskColumn:
+    """Колонка множественного выбора: бит i установлен, если выбран i-й вариант"""
+    
+    def __init__(self, options):
+        self.options = list(options)
+        self.masks = array('Q')
+    
+    def append(self, indexes):
+        mask = 0
+        for index in indexes:
+            if index < len(self.options):
+                mask |= 1 << index
+        self.masks.append(mask)
+    
+    def to_arrays(self, np, name):
+        return {
+            name: np.array(self.masks, dtype=np.uint64),
+            name + '__dictionary': np.array(self.options, dtype=str)
+        }
+
+class _NumberColumn:
+    """Числовая колонка, пропуски и нечисловые ответы - NaN"""
+    
+    def __init__(self):
+        self.values = array('d')
+    
+    def append(self, value):
+        try:
+            self.values.append(float(value))
+        except (TypeError, ValueError):
+            self.values.append(float('nan'))
+    
+    def to_arrays(self, np, name):
+        return {name: np.array(self.values, dtype=np.float64)}
+
+def _make_column(question):
+    """Выбирает способ хранения колонки по типу вопроса"""
+    options = question['options'] or []
+    if question['question_type'] == 'checkbox' and len(options) <= 64:
+        return _BitmaskColumn(options), 'bitmask'
+    if question['question_type'] == 'number':
+        return _NumberColumn(), 'float'
+    return _DictionaryColumn(options), 'dictionary'
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+def _timestamp(value):
+    """Секунды от 1970-01-01 для даты в формате БД (без учета часового пояса)"""
+    try:
+        moment = datetime.datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return 0
+    return int((moment - _EPOCH).total_seconds())
+
+def export_npz(db, survey_id, file_path, progress=None, chunk_size=1000):
+    """Выгружает ответы опроса в компактный колоночный формат NumPy (.npz).
+    
+    Каждому вопросу соответствует колонка q<id>: варианты ответа и текст
+    кодируются индексами в словаре (q<id>__dictionary), множественный выбор -
+    битовой маской, числа - float64. Описание колонок лежит в __meta__ (JSON).
+    """
+    import numpy as np
+    
+    survey = db.get_survey(survey_id)
+    questions = db.get_questions(survey_id)
+    total = db.count_survey_responses(survey_id)
+    
+    response_ids = array('q')
+    completed_at = array('q')
+    respondents = _DictionaryColumn()
+    columns = []
+    meta_columns = []
+    option_questions = set()
+    for question in questions:
+        column, encoding = _make_column(question)
+        columns.append(column)
+        if encoding == 'bitmask':
+            option_questions.add(question['id'])
+        meta_columns.append({
+            'name': f"q{question['id']}",
+            'question_id': question['id'],
+            'question_text': question['question_text'],
+            'question_type': question['question_type'],
+            'encoding': encoding
+        })
+    
+    written = 0
+    # Выбранные варианты берутся из answer_options: разбор текста ответа неоднозначен
+    records = iter_response_records(db, survey_id, questions, chunk_size, option_questions)
+    for response_id, respondent, completed, answers in records:
+        response_ids.append(response_id)
+        completed_at.append(_timestamp(completed))
+        respondents.append(respondent)
+        for column, answer in zip(columns, answers):
+            column.append(answer)
+        written += 1
+        
+        if progress and written % chunk_size == 0:
+            progress(written, total)
+    
+    arrays = {
+        'response_id': np.array(response_ids, dtype=np.int64),
+        'completed_at': np.array(completed_at, dtype=np.int64).astype('datetime64[s]'),
+    }
+    arrays.update(respondents.to_arrays(np, 'respondent'))
+    for column, meta in zip(columns, meta_columns):
+        arrays.update(column.to_arrays(np, meta['name']))
+    
+    meta = {
+        'survey_id': survey_id,
+        'title': survey['title'] if survey else '',
+        'responses': written,
+        'columns': meta_columns
+    }
+    arrays['__meta__'] = np.array(json.dumps(meta, ensure_ascii=False))
+    
+    np.savez_compressed(file_path, **arrays)
+    
+    if progress:
+        progress(written, total)
+    return written
+
+# Форматы экспорта по расширению файла
+EXPORT_FORMATS = {
+    '.csv': export_csv,
+    '.jsonl': export_jsonl,
+    '.npz': export_npz,
+}
+
+def export_survey(db, survey_id, file_path, progress=None, chunk_size=1000):
+    """Выгружает ответы опроса в формат, определяемый расширением файла"""
+    extension = os.path.splitext(file_path)[1].lower()
+    exporter = EXPORT_FORMATS.get(extension, export_csv)
+    return exporter(db, survey_id, file_path, progress, chunk_size)
@@ -1,8 +1,9 @@
 from tkinter import *
 from tkinter import ttk
 from tkinter import messagebox
-from database import Database
+from database import get_database
 from styles import AppTheme
+from async_loader import AsyncLoader
 
 class SurveyList:
     def __init__(self, master=None, db=None, username=None, show_only_user_surveys=False):
@@ -10,9 +11,13 @@ class SurveyList:
         self.master.title("Список опросов")
         self.master.geometry("800x600")
         
-        self.db = db if db else Database()
+        self.db = db if db else get_database()
         self.username = username
         self.show_only_user_surveys = show_only_user_surveys
+        self.load_task = None
+        
+        # Данные загружаются в фоне, задачи отменяются при закрытии окна
+        self.loader = AsyncLoader(self.master)
         
         # Применяем темы и стили
         self.theme = AppTheme(self.master)
@@ -42,7 +47,7 @@ class SurveyList:
                       command=self.create_new_survey).pack(anchor=W, pady=(0, 10))
         
         # Таблица опросов
-        columns = ('id', 'title', 'description', 'created_at', 'status', 'actions')
+        columns = ('id', 'title', 'description', 'created_at', 'status', 'responses')
         self.survey_tree = ttk.Treeview(main_frame, columns=columns, show='headings')
         
         # Заголовки колонок
@@ -51,7 +56,7 @@ class SurveyList:
         self.survey_tree.heading('description', text='Описание')
         self.survey_tree.heading('created_at', text='Дата создания')
         self.survey_tree.heading('status', text='Статус')
-        self.survey_tree.heading('actions', text='Действия')
+        self.survey_tree.heading('responses', text='Ответы')
         
         # Размеры колонок
         self.survey_tree.column('id', width=40, anchor='center')
@@ -59,7 +64,7 @@ class SurveyList:
         self.survey_tree.column('description', width=250)
         self.survey_tree.column('created_at', width=120, anchor='center')
         self.survey_tree.column('status', width=80, anchor='center')
-        self.survey_tree.column('actions', width=100, anchor='center')
+        self.survey_tree.column('responses', width=100, anchor='center')
         
         # Добавляем скроллбар
         scrollbar = ttk.Scrollbar(main_frame, orient="vertical", command=self.survey_tree.yview)
@@ -96,18 +101,37 @@ class SurveyList:
         self.status_bar.pack(fill=X, pady=(10, 0), anchor=W)
     
     def load_surveys(self):
-        """Загружает список опросов"""
+        """Загружает список опросов в фоне"""
+        # Повторная загрузка заменяет незавершенную
+        if self.load_task is not None:
+            self.load_task.cancel()
+        
+        self.status_bar.config(text="Загрузка опросов...")
+        self.load_task = self.loader.submit(self.fetch_surveys, self.display_surveys, self.on_load_error)
+    
+    def fetch_surveys(self):
+        """Читает опросы и количество ответов на них (выполняется в фоновом потоке)"""
+        # Получаем опросы в зависимости от режима отображения
+        if self.show_only_user_surveys:
+            surveys = self.db.get_user_surveys(self.username)
+        else:
+            surveys = self.db.get_all_surveys(active_only=True)
+        
+        # Количество ответов по опросам одним запросом
+        response_counts = self.db.get_survey_response_counts(
+            self.username if self.show_only_user_surveys else None)
+        return surveys, response_counts
+    
+    def display_surveys(self, data):
+        """Заполняет таблицу загруженными опросами"""
+        self.load_task = None
+        surveys, response_counts = data
+        
         # Очищаем текущие данные в таблице
         for item in self.survey_tree.get_children():
             self.survey_tree.delete(item)
         
         try:
-            # Получаем опросы в зависимости от режима отображения
-            if self.show_only_user_surveys:
-                surveys = self.db.get_user_surveys(self.username)
-            else:
-                surveys = self.db.get_all_surveys(active_only=True)
-            
             # Заполняем таблицу данными
             for survey in surveys:
                 survey_id, title, description, creator_id, created_at, is_active = survey
@@ -119,10 +143,11 @@ class SurveyList:
                     short_description = description
                 
                 status = "Активен" if is_active == 1 else "Неактивен"
+                responses = response_counts.get(survey_id, {}).get('responses', 0)
                 
                 # Добавляем строку в таблицу
                 self.survey_tree.insert('', END, values=(
-                    survey_id, title, short_description, created_at, status, "..."
+                    survey_id, title, short_description, created_at, status, responses
                 ))
             
             # Обновляем статусную строку
@@ -130,8 +155,13 @@ class SurveyList:
             self.status_bar.config(text=f"Загружено опросов: {count}")
             
         except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось загрузить опросы: {str(e)}")
-            self.status_bar.config(text="Ошибка при загрузке опросов")
+            self.on_load_error(e)
+    
+    def on_load_error(self, error):
+        """Сообщает об ошибке загрузки опросов"""
+        self.load_task = None
+        messagebox.showerror("Ошибка", f"Не удалось загрузить опросы: {str(error)}")
+        self.status_bar.config(text="Ошибка при загрузке опросов")
     
     def create_new_survey(self):
         """Открывает форму для создания нового опроса"""
@@ -1,18 +1,19 @@
 from tkinter import *
 from tkinter import ttk
 from tkinter import messagebox
-from database import Database
+from database import get_database
 from styles import AppTheme
 import json
 
 class SurveyViewer:
     def __init__(self, master=None, db=None, survey_id=None, username=None):
         self.master = master if master else Toplevel()
-        self.db = db if db else Database()
+        self.db = db if db else get_database()
         self.survey_id = survey_id
         self.username = username
         
-        # Данные опроса
+        # Данные опроса (скомпилированный опрос из кэша Database)
+        self.compiled = None
         self.survey = None
         self.questions = []
         self.answers = {}  # Словарь для хранения ответов пользователя
@@ -32,27 +33,18 @@ class SurveyViewer:
     def load_survey_data(self):
         """Загружает данные опроса из базы данных"""
         try:
-            # Получаем информацию об опросе
-            import sqlite3
-            conn = sqlite3.connect(self.db.db_path)
-            conn.row_factory = sqlite3.Row
-            c = conn.cursor()
+            # Опрос с вопросами и правилами проверки ответов, для популярных опросов - из кэша
+            compiled = self.db.get_compiled_survey(self.survey_id)
             
-            c.execute("SELECT * FROM surveys WHERE id = ?", (self.survey_id,))
-            survey = c.fetchone()
-            
-            if not survey:
+            if not compiled:
                 messagebox.showerror("Ошибка", f"Опрос с ID {self.survey_id} не найден")
                 self.master.destroy()
                 return
             
-            self.survey = dict(survey)
+            self.compiled = compiled
+            self.survey = compiled.survey
             self.master.title(f"Опрос: {self.survey['title']}")
-            
-            # Получаем вопросы опроса
-            self.questions = self.db.get_questions(self.survey_id)
-            
-            conn.close()
+            self.questions = compiled.questions
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось загрузить данные опроса: {str(e)}")
             self.master.destroy()
@@ -187,40 +179,35 @@ class SurveyViewer:
             return widget.get()
             
         elif question_type == 'checkbox':
+            # Выбранные варианты передаются индексами, в БД они хранятся отдельно
             selected = []
-            for option, var in widget:
+            for index, (option, var) in enumerate(widget):
                 if var.get() == 1:
-                    selected.append(option)
-            return ', '.join(selected) if selected else ""
+                    selected.append(index)
+            return selected
     
-    def validate_answers(self):
-        """Проверяет, что на все обязательные вопросы даны ответы"""
+    def collect_answers(self):
+        """Собирает ответы из виджетов: {question_id: ответ}"""
+        answers = {}
         for question in self.questions:
             q_id = question['id']
-            required = question['required'] == 1
+            answers[q_id] = self.get_answer_value(q_id, question['question_type'])
+        return answers
             
-            if required:
-                answer = self.get_answer_value(q_id, question['question_type'])
-                if not answer:
-                    return False, question['question_text']
-        
-        return True, None
+    def validate_answers(self, answers):
+        """Проверяет, что на все обязательные вопросы даны ответы"""
+        question_text = self.compiled.validate(answers)
+        return question_text is None, question_text
     
     def submit_survey(self):
         """Отправляет ответы на опрос"""
-        # Проверяем, что все обязательные поля заполнены
-        valid, question_text = self.validate_answers()
+        # Собираем ответы и проверяем, что все обязательные поля заполнены
+        answers = self.collect_answers()
+        valid, question_text = self.validate_answers(answers)
         if not valid:
             messagebox.showerror("Ошибка", f"Вы не ответили на обязательный вопрос:\n{question_text}")
             return
         
-        # Собираем ответы
-        answers = {}
-        for question in self.questions:
-            q_id = question['id']
-            answer = self.get_answer_value(q_id, question['question_type'])
-            answers[q_id] = answer
-        
         # Сохраняем ответы в базе
         if self.db.save_response(self.survey_id, self.username, answers):
             messagebox.showinfo("Успех", "Ваши ответы успешно отправлены!")
@@ -1,22 +1,48 @@
 from tkinter import *
 from tkinter import ttk
 from tkinter import messagebox
-from database import Database
+from database import get_database
 from styles import AppTheme
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
-from PIL import Image, ImageTk
-import os
-import threading
+from async_loader import AsyncLoader, get_executor
+import importlib
+import time
+
+# Тяжелые модули аналитики (matplotlib, numpy) не нужны для входа и списка опросов
+# и импортируются только при открытии аналитики. Чтобы первое открытие не ждало
+# их загрузки, после отрисовки главного окна они подгружаются в фоне.
+PREWARM_MODULES = ('numpy', 'matplotlib.figure', 'matplotlib.backends.backend_tkagg',
+                   'analytics_engine', 'chart_cache', 'survey_analytics')
+
+def prewarm_modules(modules=PREWARM_MODULES):
+    """Импортирует модули заранее (выполняется в фоновом потоке)"""
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"Ошибка предварительной загрузки модуля {name}: {e}")
 
 class Application:
-    def __init__(self):
-        self.db = Database()
+    # Сколько опросов показывать в каталоге за один раз
+    CATALOG_PAGE_SIZE = 20
+    
+    # Цель по времени от запуска до отрисовки главного окна, с
+    FIRST_WINDOW_TARGET = 1.0
+    
+    def __init__(self, started_at=None, prewarm=True, db=None):
+        # Момент запуска (time.perf_counter), от которого считается время до первого окна
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.first_window_time = None
+        self.prewarm = prewarm
+        
+        # db - другой экземпляр Database (например, временная БД бенчмарка)
+        self.db = db if db else get_database()
         self.current_user = None
         self.windows = {}
         self.current_view = None
         self.image_cache = {}
+        self.loader = None
+        self.view_task = None
+        self.catalog = None
     
     def create_window(self):
         self.root = Tk()
@@ -26,6 +52,9 @@ class Application:
         # Применяем темы и стили
         self.theme = AppTheme(self.root)
         
+        # Фоновая загрузка данных для представлений
+        self.loader = AsyncLoader(self.root)
+        
         # Создаем меню
         self.create_menu()
         
@@ -35,6 +64,20 @@ class Application:
         # Показываем приветственное сообщение
         self.show_welcome_screen()
         
+        # Замер времени запуска и фоновая загрузка модулей - после отрисовки окна
+        self.root.after_idle(self.on_first_window)
+    
+    def on_first_window(self):
+        """Вызывается после отрисовки главного окна"""
+        self.root.update_idletasks()
+        self.first_window_time = time.perf_counter() - self.started_at
+        if self.first_window_time > self.FIRST_WINDOW_TARGET:
+            print(f"Главное окно открылось за {self.first_window_time:.2f} с "
+                  f"(цель - {self.FIRST_WINDOW_TARGET:.2f} с)")
+        
+        if self.prewarm:
+            get_executor().submit(prewarm_modules)
+        
     def create_menu(self):
         menu_bar = Menu(self.root)
         
@@ -230,13 +273,41 @@ class Application:
     
     def clear_content_frame(self):
         """Очищает рабочую область"""
+        # Данные для прежнего представления больше не нужны
+        if self.view_task is not None:
+            self.view_task.cancel()
+            self.view_task = None
+        
         for widget in self.content_frame.winfo_children():
             widget.destroy()
     
+    def load_view_data(self, func, callback):
+        """Загружает данные представления в фоне, показывая заглушку.
+        
+        callback(data) вызывается в главном потоке, когда данные готовы,
+        если пользователь к этому времени не перешел к другому представлению.
+        """
+        placeholder = Label(self.content_frame, text="Загрузка...",
+                           font=self.theme.fonts['normal'],
+                           bg=self.theme.colors['background'],
+                           fg=self.theme.colors['text_secondary'])
+        placeholder.pack(pady=30)
+        
+        def on_loaded(data):
+            self.view_task = None
+            placeholder.destroy()
+            callback(data)
+        
+        def on_error(error):
+            self.view_task = None
+            placeholder.config(text=f"Не удалось загрузить данные: {error}")
+        
+        self.view_task = self.loader.submit(func, on_loaded, on_error)
+    
     def show_login_window(self):
         from login_window import LoginWindow
         login_window = Toplevel(self.root)
-        app = LoginWindow(login_window, self.on_login_success)
+        app = LoginWindow(login_window, self.on_login_success, self.db)
     
     def show_registration_window(self):
         from registration_window import RegistrationWindow
@@ -285,25 +356,102 @@ class Application:
              bg=self.theme.colors['background'],
              fg=self.theme.colors['primary']).pack(pady=(0, 20))
         
-        # Получаем список активных опросов
-        surveys = self.db.get_all_surveys(active_only=True)
-        
-        if not surveys:
-            Label(self.content_frame, text="Нет доступных опросов", 
-                 font=self.theme.fonts['normal'],
-                 bg=self.theme.colors['background']).pack(pady=30)
-            return
+        # Строка поиска по названию и описанию
+        search_frame = Frame(self.content_frame, bg=self.theme.colors['background'])
+        search_frame.pack(fill=X, pady=(0, 10))
+        
+        search_var = StringVar()
+        search_entry = ttk.Entry(search_frame, textvariable=search_var, width=50)
+        search_entry.pack(side=LEFT, padx=(0, 10))
+        search_entry.bind("<Return>", lambda e: self.search_available_surveys(search_var.get()))
+        ttk.Button(search_frame, text="Найти",
+                  command=lambda: self.search_available_surveys(search_var.get())).pack(side=LEFT)
+        
+        # Холст с прокруткой: страницы карточек выше окна, а строка состояния
+        # и кнопка "Показать еще" идут после карточек
+        list_frame = Frame(self.content_frame, bg=self.theme.colors['background'])
+        list_frame.pack(fill=BOTH, expand=True, pady=10)
+        
+        canvas = Canvas(list_frame, bg=self.theme.colors['background'], highlightthickness=0)
+        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=canvas.yview)
+        scrollable_frame = Frame(canvas, bg=self.theme.colors['background'])
+        
+        scrollable_frame.bind(
+            "<Configure>",
+            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+        )
+        
+        frame_id = canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
+        # Карточки растягиваются по ширине холста
+        canvas.bind("<Configure>", lambda e: canvas.itemconfigure(frame_id, width=e.width))
+        canvas.configure(yscrollcommand=scrollbar.set)
+        
+        canvas.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        # Контейнер для карточек опросов
+        surveys_frame = Frame(scrollable_frame, bg=self.theme.colors['background'])
+        surveys_frame.pack(fill=X)
+        
+        # Строка состояния и кнопка загрузки следующей страницы
+        status_label = Label(scrollable_frame, text="",
+                            font=self.theme.fonts['normal'],
+                            bg=self.theme.colors['background'],
+                            fg=self.theme.colors['text_secondary'])
+        status_label.pack(pady=10)
+        more_button = ttk.Button(scrollable_frame, text="Показать еще",
+                                command=self.load_available_surveys_page)
+        
+        # Состояние каталога: текущий поиск и id последнего показанного опроса
+        self.catalog = {
+            'search': '',
+            'last_id': None,
+            'count': 0,
+            'canvas': canvas,
+            'frame': surveys_frame,
+            'status': status_label,
+            'more': more_button
+        }
+        self.load_available_surveys_page()
+    
+    def search_available_surveys(self, text):
+        """Начинает каталог заново с новой строкой поиска"""
+        if self.view_task is not None:
+            self.view_task.cancel()
         
-        # Создаем контейнер для карточек опросов
-        surveys_frame = Frame(self.content_frame, bg=self.theme.colors['background'])
-        surveys_frame.pack(fill=BOTH, expand=True, pady=10)
+        for widget in self.catalog['frame'].winfo_children():
+            widget.destroy()
+        self.catalog['canvas'].yview_moveto(0)
+        self.catalog.update(search=text.strip(), last_id=None, count=0)
+        self.load_available_surveys_page()
+    
+    def load_available_surveys_page(self):
+        """Загружает в фоне следующую страницу каталога опросов"""
+        catalog = self.catalog
+        catalog['status'].config(text="Загрузка...")
+        catalog['more'].pack_forget()
+        
+        search, before_id = catalog['search'], catalog['last_id']
+        self.view_task = self.loader.submit(
+            lambda: self.db.get_surveys_page(active_only=True, before_id=before_id,
+                                             limit=self.CATALOG_PAGE_SIZE, search=search),
+            self.display_available_surveys,
+            lambda error: catalog['status'].config(text=f"Не удалось загрузить опросы: {error}"))
+    
+    def display_available_surveys(self, surveys):
+        """Добавляет в каталог карточки загруженной страницы опросов"""
+        self.view_task = None
+        catalog = self.catalog
+        catalog['count'] += len(surveys)
+        if surveys:
+            catalog['last_id'] = surveys[-1][0]
         
         # Создаем карточку для каждого опроса
         for survey in surveys:
             survey_id, title, description, creator_id, created_at, is_active = survey
             
             # Создаем карточку опроса
-            survey_card = self.theme.create_card_frame(surveys_frame)
+            survey_card = self.theme.create_card_frame(catalog['frame'])
             survey_card.pack(fill=X, pady=10)
             
             # Заголовок опроса
@@ -325,6 +473,16 @@ class Application:
             # Кнопка прохождения опроса
             ttk.Button(survey_card, text="Пройти опрос", 
                       command=lambda sid=survey_id: self.take_survey(sid)).pack(anchor=E, padx=10, pady=10)
+        
+        # Полная страница - возможно, есть еще опросы
+        if len(surveys) == self.CATALOG_PAGE_SIZE:
+            catalog['more'].pack(pady=(0, 10))
+        
+        if not catalog['count']:
+            text = "Ничего не найдено" if catalog['search'] else "Нет доступных опросов"
+        else:
+            text = f"Показано опросов: {catalog['count']}"
+        catalog['status'].config(text=text)
     
     def take_survey(self, survey_id):
         """Открывает выбранный опрос для прохождения"""
@@ -361,8 +519,15 @@ class Application:
         ttk.Button(self.content_frame, text="+ Создать новый опрос", 
                   command=self.show_survey_creator).pack(anchor=W, pady=10)
         
-        # Получаем список опросов пользователя
-        surveys = self.db.get_user_surveys(self.current_user)
+        # Опросы пользователя и количество ответов на них загружаем в фоне
+        username = self.current_user
+        self.load_view_data(lambda: (self.db.get_user_surveys(username),
+                                     self.db.get_survey_response_counts(username)),
+                            self.display_my_surveys)
+    
+    def display_my_surveys(self, data):
+        """Выводит таблицу загруженных опросов пользователя"""
+        surveys, response_counts = data
         
         if not surveys:
             Label(self.content_frame, text="У вас еще нет созданных опросов", 
@@ -392,8 +557,8 @@ class Application:
         for survey in surveys:
             survey_id = survey[0]
             
-            # Получаем количество ответов на опрос (в реальном проекте должна быть функция для этого)
-            responses = len(self.db.get_survey_responses(survey_id))
+            # Получаем количество ответов на опрос
+            responses = response_counts.get(survey_id, {}).get('responses', 0)
             
             # Статус опроса
             status = "Активен" if survey[5] == 1 else "Неактивен"
@@ -0,0 +1,13 @@
+# Бенчмарки слоя работы с БД.
+#
+#   python -m benchmarks.run --responses 20000 --output bench.json
+#   python -m benchmarks.run --compare bench.json
+#
+# Модули приложения импортируются так же, как в самом приложении
+# (from database import ...), поэтому каталог app добавляется в путь поиска.
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
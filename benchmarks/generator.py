@@ -0,0 +1,159 @@
+import os
+import datetime
+import math
+import random
+import time
+import benchmarks  # добавляет каталог app в путь поиска модулей
+from database import Database
+
+# Генератор синтетических данных для бенчмарков.
+# Распределения приближены к реальной нагрузке: популярность опросов и активность
+# респондентов подчиняются закону Ципфа (немногие опросы собирают большую часть
+# ответов), варианты ответа выбираются неравномерно, длина текстовых ответов
+# распределена логнормально, а необязательные вопросы часто пропускают.
+
+WORDS = ("опрос ответ вопрос качество сервис доставка цена удобно быстро медленно "
+         "хорошо плохо отлично нормально интерфейс приложение поддержка оплата заказ "
+         "товар сайт время работа команда проект задача идея предложение улучшить").split()
+
+OPTION_SETS = [
+    ["Да", "Нет"],
+    ["Да", "Нет", "Затрудняюсь ответить"],
+    ["Очень плохо", "Плохо", "Нормально", "Хорошо", "Отлично"],
+    ["До 18", "18-24", "25-34", "35-44", "45-54", "55 и старше"],
+    ["Москва", "Санкт-Петербург", "Новосибирск", "Екатеринбург", "Казань", "Другой город"],
+    ["Email", "Телефон", "Мессенджер", "Соцсети", "Лично"],
+]
+
+# Доли типов вопросов в опросе
+QUESTION_TYPES = [('radio', 0.5), ('checkbox', 0.25), ('text', 0.25)]
+
+def zipf_weights(count, exponent=1.1):
+    """Веса элементов по закону Ципфа: вес k-го элемента пропорционален 1 / k^exponent"""
+    return [1.0 / (rank ** exponent) for rank in range(1, count + 1)]
+
+def random_text(rng, mean_words=8):
+    """Текстовый ответ логнормальной длины из словаря WORDS"""
+    length = max(1, int(rng.lognormvariate(math.log(mean_words), 0.8)))
+    return " ".join(rng.choice(WORDS) for _ in range(length)).capitalize()
+
+def make_question(rng, number):
+    """Описание вопроса для create_survey_with_questions"""
+    question_type = rng.choices([t for t, _ in QUESTION_TYPES], [w for _, w in QUESTION_TYPES])[0]
+    question = {
+        'question_text': f"Вопрос {number}: {random_text(rng, 5)}?",
+        'question_type': question_type,
+        'required': 1 if rng.random() < 0.7 else 0,
+        'options': None,
+    }
+    if question_type != 'text':
+        question['options'] = list(rng.choice(OPTION_SETS))
+    return question
+
+class AnswerModel:
+    """Модель ответов на вопросы одного опроса.
+    
+    Для каждого вопроса заранее выбираются предпочтения респондентов: веса
+    вариантов (распределение Дирихле), вероятности отметить вариант
+    множественного выбора и вероятность пропустить необязательный вопрос.
+    """
+    
+    def __init__(self, rng, questions):
+        self.rng = rng
+        self.questions = []
+        for question in questions:
+            options = question['options'] or []
+            weights = [rng.gammavariate(0.8, 1.0) for _ in options]
+            marks = [rng.uniform(0.05, 0.6) for _ in options]
+            skip = 0.0 if question['required'] else rng.uniform(0.2, 0.6)
+            self.questions.append((question['id'], question['question_type'], options, weights, marks, skip))
+    
+    def answers(self):
+        """Ответы одной анкеты: {question_id: answer_text}"""
+        rng = self.rng
+        answers = {}
+        for question_id, question_type, options, weights, marks, skip in self.questions:
+            if skip and rng.random() < skip:
+                continue
+            
+            if question_type == 'radio':
+                answers[question_id] = rng.choices(options, weights)[0]
+            elif question_type == 'checkbox':
+                selected = [option for option, mark in zip(options, marks) if rng.random() < mark]
+                answers[question_id] = ", ".join(selected or [rng.choice(options)])
+            else:
+                answers[question_id] = random_text(rng)
+        return answers
+
+def generate(db, users=200, surveys=50, responses=20000, questions=(3, 12), days=180, seed=42):
+    """Заполняет БД синтетическими пользователями, опросами и анкетами.
+    
+    Возвращает сводку: количество созданных записей, имена пользователей,
+    id опросов (от самого популярного к наименее популярному) и время генерации.
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    now = datetime.datetime.now()
+    
+    # Пользователи: первые 5% - авторы опросов
+    usernames = [f"user{index:06d}" for index in range(users)]
+    user_rows = []
+    for name in usernames:
+        created_at = now - datetime.timedelta(days=rng.uniform(0, days))
+        user_rows.append((name, "password", created_at.strftime("%Y-%m-%d %H:%M:%S")))
+    with db.transaction() as conn:
+        conn.executemany("""INSERT OR IGNORE INTO users (username, password, is_admin, created_at)
+                            VALUES (?, ?, 0, ?)""", user_rows)
+    creators = usernames[:max(1, users // 20)]
+    
+    # Опросы с вопросами; у каждого свои предпочтения респондентов
+    survey_ids = []
+    models = []
+    for number in range(1, surveys + 1):
+        survey_questions = [make_question(rng, i) for i in range(1, rng.randint(*questions) + 1)]
+        survey_id = db.create_survey_with_questions(
+            f"Опрос {number}: {random_text(rng, 4)}", random_text(rng, 20),
+            rng.choice(creators), survey_questions)
+        survey_ids.append(survey_id)
+        models.append(AnswerModel(rng, db.get_questions(survey_id)))
+    
+    survey_weights = zipf_weights(len(survey_ids))
+    user_weights = zipf_weights(len(usernames), 0.8)
+    
+    def submissions():
+        for _ in range(responses):
+            index = rng.choices(range(len(survey_ids)), survey_weights)[0]
+            completed_at = now - datetime.timedelta(seconds=rng.uniform(0, days * 86400))
+            started_at = completed_at - datetime.timedelta(seconds=rng.lognormvariate(math.log(120), 0.7))
+            yield {
+                'survey_id': survey_ids[index],
+                'respondent': rng.choices(usernames, user_weights)[0],
+                'answers': models[index].answers(),
+                'started_at': started_at.strftime("%Y-%m-%d %H:%M:%S"),
+                'completed_at': completed_at.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+    
+    report = db.save_responses(submissions())
+    
+    return {
+        'users': len(usernames),
+        'surveys': len(survey_ids),
+        'responses': report['responses'],
+        'answers': report['answers'],
+        'seconds': time.perf_counter() - started,
+        'usernames': usernames,
+        'creators': creators,
+        'survey_ids': survey_ids,
+        'models': models,
+    }
+
+if __name__ == "__main__":
+    # Заполнение отдельной БД: python -m benchmarks.generator <путь к БД> [анкет]
+    import sys
+    
+    path = sys.argv[1] if len(sys.argv) > 1 else "benchmark.db"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    summary = generate(Database(os.path.abspath(path)), responses=count)
+    print(f"Пользователей: {summary['users']}, опросов: {summary['surveys']}, "
+          f"анкет: {summary['responses']}, ответов: {summary['answers']} "
+          f"за {summary['seconds']:.1f} с")
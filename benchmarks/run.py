@@ -0,0 +1,172 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import platform
+import tempfile
+import subprocess
+import benchmarks  # добавляет каталог app в путь поиска модулей
+from database import Database
+from survey_export import export_survey
+from query_stats import percentile
+import migrations
+from benchmarks.generator import generate, zipf_weights
+
+# Замер операций слоя БД на синтетических данных.
+# Каждая операция выполняется заданное число раз, по задержкам считаются
+# операции в секунду и перцентили; отчет сохраняется в JSON, чтобы сравнивать
+# результаты разных версий (--compare).
+
+def measure(operation, arguments):
+    """Выполняет operation(*args) для каждого набора аргументов и возвращает статистику задержек"""
+    latencies = []
+    started = time.perf_counter()
+    for args in arguments:
+        call_started = time.perf_counter()
+        operation(*args)
+        latencies.append(time.perf_counter() - call_started)
+    total = time.perf_counter() - started
+    
+    latencies.sort()
+    return {
+        'operations': len(latencies),
+        'seconds': total,
+        'ops_per_sec': len(latencies) / total if total else 0.0,
+        'mean_ms': 1000 * total / len(latencies) if latencies else 0.0,
+        'p50_ms': 1000 * percentile(latencies, 0.50),
+        'p99_ms': 1000 * percentile(latencies, 0.99),
+        'max_ms': 1000 * latencies[-1] if latencies else 0.0,
+    }
+
+def git_revision():
+    """Текущий коммит репозитория, если он доступен"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=os.path.dirname(benchmarks.APP_DIR),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+def run(options):
+    """Генерирует данные, замеряет операции и возвращает отчет"""
+    rng = random.Random(options.seed + 1)
+    work_dir = tempfile.mkdtemp(prefix="survey_bench_")
+    try:
+        db = Database(os.path.join(work_dir, "bench.db"))
+        dataset = generate(db, users=options.users, surveys=options.surveys,
+                           responses=options.responses, seed=options.seed)
+        
+        survey_ids = dataset['survey_ids']
+        survey_weights = zipf_weights(len(survey_ids))
+        models = dict(zip(survey_ids, dataset['models']))
+        
+        # Статистика запросов - только по замеряемым операциям, без генерации данных
+        db.reset_query_stats()
+        
+        def popular_surveys(count):
+            # Опросы открывают с той же частотой, с какой на них отвечают
+            return rng.choices(survey_ids, survey_weights, k=count)
+        
+        results = {}
+        
+        # Отправка анкеты респондентом
+        submissions = [(survey_id, rng.choice(dataset['usernames']), models[survey_id].answers())
+                       for survey_id in popular_surveys(options.iterations)]
+        results['save_response'] = measure(db.save_response, submissions)
+        
+        results['get_questions'] = measure(
+            db.get_questions, [(survey_id,) for survey_id in popular_surveys(options.iterations)])
+        
+        # Открытие опроса респондентом - через кэш скомпилированных опросов
+        results['get_compiled_survey'] = measure(
+            db.get_compiled_survey, [(survey_id,) for survey_id in popular_surveys(options.iterations)])
+        survey_cache = db.survey_cache.stats()
+        
+        results['get_user_surveys'] = measure(
+            db.get_user_surveys, [(rng.choice(dataset['creators']),) for _ in range(options.iterations)])
+        
+        # Полная выборка ответов и экспорт - на самом популярном опросе и на случайных
+        heavy = max(1, options.iterations // 20)
+        largest = survey_ids[:1] * heavy
+        results['get_survey_responses'] = measure(
+            db.get_survey_responses, [(survey_id,) for survey_id in popular_surveys(heavy)])
+        results['get_survey_responses_largest'] = measure(
+            db.get_survey_responses, [(survey_id,) for survey_id in largest])
+        
+        export_path = os.path.join(work_dir, "export.csv")
+        results['export_csv_largest'] = measure(
+            export_survey, [(db, survey_id, export_path) for survey_id in largest])
+        
+        with db.connection() as conn:
+            largest_responses = conn.execute("SELECT COUNT(*) FROM responses WHERE survey_id = ?",
+                                             (survey_ids[0],)).fetchone()[0]
+        queries = db.get_query_stats()
+        db.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    return {
+        'revision': git_revision(),
+        'created_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'schema_version': migrations.SCHEMA_VERSION,
+        'parameters': vars(options).copy(),
+        'dataset': {
+            'users': dataset['users'],
+            'surveys': dataset['surveys'],
+            'responses': dataset['responses'],
+            'answers': dataset['answers'],
+            'largest_survey_responses': largest_responses,
+            'generate_seconds': dataset['seconds'],
+        },
+        'survey_cache': survey_cache,
+        'queries': queries,
+        'results': results,
+    }
+
+def compare(report, baseline):
+    """Печатает изменение ops/sec и p99 относительно отчета предыдущей версии"""
+    print(f"Сравнение с {baseline.get('revision') or 'базовым отчетом'}:")
+    for name, result in report['results'].items():
+        old = baseline.get('results', {}).get(name)
+        if not old or not old['ops_per_sec'] or not old['p99_ms']:
+            print(f"  {name}: нет данных в базовом отчете")
+            continue
+        speed = result['ops_per_sec'] / old['ops_per_sec']
+        tail = result['p99_ms'] / old['p99_ms']
+        print(f"  {name}: ops/sec x{speed:.2f}, p99 x{tail:.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк слоя БД на синтетических данных")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--surveys", type=int, default=50)
+    parser.add_argument("--responses", type=int, default=20000)
+    parser.add_argument("--iterations", type=int, default=200, help="повторов каждой операции")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="файл для JSON-отчета (по умолчанию - вывод в консоль)")
+    parser.add_argument("--compare", help="JSON-отчет предыдущей версии для сравнения")
+    options = parser.parse_args(argv)
+    
+    baseline_path = options.compare
+    output_path = options.output
+    del options.compare, options.output
+    report = run(options)
+    
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,84 @@
+import sys
+import json
+import argparse
+import subprocess
+import benchmarks  # добавляет каталог app в путь поиска модулей
+
+# Замер запуска приложения в отдельном процессе интерпретатора:
+# время импорта главного окна, какие тяжелые модули при этом загружены
+# и (если есть дисплей) время до отрисовки главного окна.
+
+HEAVY_MODULES = ('numpy', 'matplotlib', 'PIL')
+
+# Выполняется в дочернем процессе, печатает JSON с замерами
+# Приложение работает с временной БД, чтобы не трогать БД пользователя
+PROBE = """
+import os, json, sys, time, shutil, tempfile
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import window_core
+result = {'import_seconds': time.perf_counter() - started,
+          'heavy_modules': [name for name in sys.argv[2:] if name in sys.modules],
+          'first_window_seconds': None}
+work_dir = tempfile.mkdtemp(prefix="survey_startup_")
+try:
+    from database import Database
+    db = Database(os.path.join(work_dir, "startup.db"))
+    app = window_core.Application(started_at=started, prewarm=False, db=db)
+    app.create_window()
+except Exception as e:
+    result['window_error'] = str(e)
+else:
+    def finish():
+        result['first_window_seconds'] = app.first_window_time
+        app.root.destroy()
+    app.root.after_idle(lambda: app.root.after_idle(finish))
+    app.start()
+finally:
+    shutil.rmtree(work_dir, ignore_errors=True)
+print(json.dumps(result))
+"""
+
+def measure_startup(runs=5):
+    """Запускает приложение runs раз и возвращает замеры каждого запуска"""
+    results = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, "-c", PROBE, benchmarks.APP_DIR] + list(HEAVY_MODULES),
+                                         text=True)
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замер времени запуска приложения")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="файл для JSON-отчета (по умолчанию - вывод в консоль)")
+    options = parser.parse_args(argv)
+    
+    from window_core import Application
+    
+    runs = measure_startup(options.runs)
+    imports = sorted(run['import_seconds'] for run in runs)
+    windows = sorted(run['first_window_seconds'] for run in runs if run['first_window_seconds'] is not None)
+    report = {
+        'runs': runs,
+        'import_seconds_median': imports[len(imports) // 2],
+        'heavy_modules': sorted({name for run in runs for name in run['heavy_modules']}),
+        'first_window_seconds_median': windows[len(windows) // 2] if windows else None,
+        'first_window_target': Application.FIRST_WINDOW_TARGET,
+    }
+    # Без дисплея окно не создается, и цель по времени проверить нельзя
+    if report['first_window_seconds_median'] is None:
+        report['target_met'] = None
+    else:
+        report['target_met'] = (not report['heavy_modules']
+                                and report['first_window_seconds_median'] <= Application.FIRST_WINDOW_TARGET)
+    
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])